@@ -0,0 +1,296 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from . import parse_3ds
+
+from .storage_3ds import atomic_write
+
+from .scene_3ds import (
+    Lamp3DS,
+    Material3DS,
+    Mesh3DS,
+    Node3DS,
+    Scene3DS,
+    TextureMap3DS,
+)
+
+# Bump when the parser output or the cache layout changes, older entries are ignored
+CACHE_VERSION = 1
+
+CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "io_scene_3ds")
+CACHE_SIZE_LIMIT = 1024 * 1024 * 1024
+
+CACHE_MAGIC = b"3DSC"
+CACHE_HEADER = struct.Struct("<4sI")  # magic, length of the JSON description
+CACHE_ALIGNMENT = 16
+HASH_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def file_key(filepath):
+    """
+    Hashes the content of a file together with the cache version.
+
+    Args:
+    filepath (str): Path of the 3DS file.
+
+    Returns:
+    str: Hex digest naming the cache entry of the file.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(b"%d" % CACHE_VERSION)
+    with open(filepath, "rb") as file:
+        while True:
+            block = file.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(key, directory=CACHE_DIRECTORY):
+    return os.path.join(directory, key + ".3dscache")
+
+
+def store_scene(
+    filepath, scene, directory=CACHE_DIRECTORY, size_limit=CACHE_SIZE_LIMIT, key=None
+):
+    """
+    Writes the parsed scene of a file to the cache, as a JSON description
+    followed by the raw arrays, then evicts the least recently used entries
+    over the size limit.
+
+    Args:
+    filepath (str): Path of the 3DS file the scene was parsed from.
+    scene (Scene3DS): The parsed scene.
+    directory (str): Directory of the cache.
+    size_limit (int): Size of the cache directory to stay within, in bytes.
+    key (str): Key of the file, when already computed by file_key.
+    """
+    if key is None:
+        key = file_key(filepath)
+
+    blobs = []
+    data_size = 0
+
+    def add_array(array):
+        nonlocal data_size
+        if array is None:
+            return None
+        array = np.ascontiguousarray(array)
+        offset = data_size
+        blobs.append((offset, array))
+        data_size += -(-array.nbytes // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+        return offset, list(array.shape), array.dtype.str
+
+    description = {
+        "version": scene.version,
+        "materials": [
+            {
+                "name": material.name,
+                "ambient": material.ambient,
+                "diffuse": material.diffuse,
+                "specular": material.specular,
+                "alpha": material.alpha,
+                "maps": [
+                    (texture_map.mapto, texture_map.filename, texture_map.scale,
+                     texture_map.offset, texture_map.extension)
+                    for texture_map in material.maps
+                ],
+            }
+            for material in scene.materials
+        ],
+        "meshes": [
+            {
+                "name": mesh.name,
+                "vertices": add_array(mesh.vertices),
+                "faces": add_array(mesh.faces),
+                "uvs": add_array(mesh.uvs),
+                "materials": [(name, add_array(faces)) for name, faces in mesh.materials],
+                "matrix": mesh.matrix,
+            }
+            for mesh in scene.meshes
+        ],
+        "lamps": [(lamp.name, lamp.location) for lamp in scene.lamps],
+        "nodes": [
+            (node.ID, node.name, node.instance_name, node.parent, node.pivot)
+            for node in scene.nodes
+        ],
+    }
+
+    header = json.dumps(description).encode("utf-8")
+    data_start = CACHE_HEADER.size + len(header)
+    padding = -data_start % CACHE_ALIGNMENT
+
+    os.makedirs(directory, exist_ok=True)
+    with atomic_write(cache_path(key, directory)) as file:
+        file.write(CACHE_HEADER.pack(CACHE_MAGIC, len(header)))
+        file.write(header)
+        file.write(bytes(padding))
+        for offset, array in blobs:
+            file.seek(data_start + padding + offset)
+            file.write(array.tobytes())
+        file.truncate(data_start + padding + data_size)
+
+    evict(directory, size_limit)
+
+
+def load_scene(filepath, directory=CACHE_DIRECTORY, key=None):
+    """
+    Reads the cached scene of a file. The arrays are views of the memory
+    mapped cache entry, nothing is decoded.
+
+    Args:
+    filepath (str): Path of the 3DS file.
+    directory (str): Directory of the cache.
+    key (str): Key of the file, when already computed by file_key.
+
+    Returns:
+    Scene3DS: The cached scene, or None if the file isn't cached.
+    """
+    if key is None:
+        key = file_key(filepath)
+    path = cache_path(key, directory)
+
+    try:
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = CACHE_HEADER.unpack_from(buffer, 0)
+        if magic != CACHE_MAGIC:
+            return None
+        header = buffer[CACHE_HEADER.size:CACHE_HEADER.size + header_size]
+        description = json.loads(header)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    data_start = CACHE_HEADER.size + header_size
+    data_start += -data_start % CACHE_ALIGNMENT
+
+    def get_array(reference):
+        if reference is None:
+            return None
+        offset, shape, dtype = reference
+        count = int(np.prod(shape))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + offset)
+        return array.reshape(shape)
+
+    try:
+        scene = build_scene(description, get_array)
+    except (ValueError, TypeError, KeyError):
+        # A truncated or corrupt entry is a miss, it is replaced by the next store
+        return None
+
+    # Mark the entry as recently used for the eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    return scene
+
+
+def build_scene(description, get_array):
+    """
+    Rebuilds a scene from the JSON description of a cache entry.
+
+    Args:
+    description (dict): The description written by store_scene.
+    get_array (function): Returns the array of a reference of the description.
+
+    Returns:
+    Scene3DS: The scene.
+    """
+    scene = Scene3DS()
+    scene.version = description["version"]
+
+    for data in description["materials"]:
+        material = Material3DS(data["name"])
+        material.ambient = data["ambient"]
+        material.diffuse = data["diffuse"]
+        material.specular = data["specular"]
+        material.alpha = data["alpha"]
+        material.maps = [
+            TextureMap3DS(mapto, filename, tuple(scale), tuple(offset), extension)
+            for mapto, filename, scale, offset, extension in data["maps"]
+        ]
+        scene.materials.append(material)
+
+    for data in description["meshes"]:
+        mesh = Mesh3DS(data["name"])
+        mesh.vertices = get_array(data["vertices"])
+        mesh.faces = get_array(data["faces"])
+        mesh.uvs = get_array(data["uvs"])
+        mesh.materials = [(name, get_array(faces)) for name, faces in data["materials"]]
+        mesh.matrix = tuple(data["matrix"]) if data["matrix"] is not None else None
+        scene.meshes.append(mesh)
+
+    scene.lamps = [Lamp3DS(name, tuple(location)) for name, location in description["lamps"]]
+
+    for node_id, name, instance_name, parent, pivot in description["nodes"]:
+        node = Node3DS(node_id)
+        node.name = name
+        node.instance_name = instance_name
+        node.parent = parent
+        node.pivot = tuple(pivot) if pivot is not None else None
+        scene.nodes.append(node)
+
+    return scene
+
+
+def evict(directory=CACHE_DIRECTORY, size_limit=CACHE_SIZE_LIMIT):
+    """
+    Deletes the least recently used cache entries until the cache directory
+    fits in the size limit.
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".3dscache"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total_size = sum(size for mtime, size, path in entries)
+    for mtime, size, path in sorted(entries):
+        if total_size <= size_limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_size -= size
+
+
+def parse_3ds_cached(file, filepath, texturePrefetch=None, directory=CACHE_DIRECTORY):
+    """
+    Parses a 3DS file through the cache: the cached scene is used when the
+    content of the file was parsed before, otherwise the file is parsed and
+    the scene is added to the cache.
+
+    Args:
+    file (Reader3DS): The opened file.
+    filepath (str): Path of the file.
+    texturePrefetch (TexturePrefetch): Optional prefetcher to queue texture files on.
+    directory (str): Directory of the cache.
+
+    Returns:
+    Scene3DS: The scene, or None if the file isn't a 3DS file.
+    """
+    key = file_key(filepath)
+    scene = load_scene(filepath, directory, key)
+    if scene is not None:
+        if texturePrefetch is not None:
+            for material in scene.materials:
+                for texture_map in material.maps:
+                    texturePrefetch.submit(texture_map.filename)
+        return scene
+
+    scene = parse_3ds.parse_3ds(file, texturePrefetch)
+    if scene is not None:
+        try:
+            store_scene(filepath, scene, directory, key=key)
+        except OSError as error:
+            print("\tWarning: could not write the parse cache:", error)
+    return scene
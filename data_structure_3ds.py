@@ -117,3 +117,34 @@ EK_OB_SCALE_TRACK = 0xB022
 # EK_OB_FALLOF_TRACK = 0xB028
 # EK_OB_HIDE_TRACK = 0xB029
 # EK_OB_NODE_ID = 0xB030
+
+# Chunks whose sub chunks are walked by the importer, after any data of their own
+CONTAINER_CHUNKS = {
+    PRIMARY,
+    OBJECTINFO,
+    EDITKEYFRAME,
+    MATERIAL,
+    MAT_TEXTURE_MAP,
+    MAT_SPECULAR_MAP,
+    MAT_OPACITY_MAP,
+    MAT_BUMP_MAP,
+    OBJECT,
+    OBJECT_MESH,
+    OBJECT_FACES,
+    OBJECT_LAMP,
+    ED_KEY_AMBIENT_NODE,
+    ED_KEY_OBJECT_NODE,
+    ED_KEY_CAMERA_NODE,
+    ED_KEY_TARGET_NODE,
+    ED_KEY_LIGHT_NODE,
+    ED_KEY_L_TARGET_NODE,
+    ED_KEY_SPOTLIGHT_NODE,
+}
+
+# Channels of the texture map chunks
+TEXTURE_MAPTO = {
+    MAT_TEXTURE_MAP: "COLOR",
+    MAT_SPECULAR_MAP: "SPECULARITY",
+    MAT_OPACITY_MAP: "ALPHA",
+    MAT_BUMP_MAP: "NORMAL",
+}
@@ -33,6 +33,8 @@ from the lib3ds project (http://lib3ds.sourceforge.net/) sourcecode.
 # Some of the chunks that we will export
 # ----- Primary Chunk, at the beginning of each file
 import struct
+from contextlib import contextmanager
+import numpy as np
 PRIMARY = 0x4D4D
 
 # ------ Main Chunks
@@ -128,10 +130,6 @@ def sane_name(name):
     return new_name
 
 
-def uv_key(uv):
-    return round(uv[0], 6), round(uv[1], 6)
-
-
 # size defines:
 SZ_SHORT = 2
 SZ_INT = 4
@@ -337,6 +335,82 @@ class _3ds_array(object):
         return '(%d items)' % len(self.values)
 
 
+class _3ds_bulk_array(object):
+    """Class representing an array of fixed size items for a 3ds file, stored as one NumPy array.
+
+    Like _3ds_array, it is written as a _3ds_ushort item count followed by the items, but its size
+    is known without visiting the items and all items are written with a single call."""
+    __slots__ = ("values", "fits")
+
+    dtype = None  # little-endian type of one field of an item
+    columns = 1  # fields per item
+
+    def __init__(self, values):
+        self.values = self.convert(values).reshape(-1, self.columns)
+
+    def convert(self, values):
+        """Convert values to the field type.
+
+        astype wraps integers that don't fit instead of raising, so whether they all fit is kept
+        for validate."""
+        values = np.asarray(values)
+        self.fits = True
+        if values.size and values.dtype.kind in "iu" and np.dtype(self.dtype).kind == "u":
+            self.fits = bool(values.min() >= 0 and values.max() <= np.iinfo(self.dtype).max)
+        return np.ascontiguousarray(values.astype(self.dtype, copy=False))
+
+    def get_size(self):
+        return SZ_SHORT + self.values.nbytes
+
+    def validate(self):
+        return len(self.values) <= 65535 and self.fits
+
+    def write(self, file):
+        _3ds_ushort(len(self.values)).write(file)
+        file.write(self.values.tobytes())
+
+    def __len__(self):
+        return len(self.values)
+
+    def __str__(self):
+        return '(%d items)' % len(self.values)
+
+
+class _3ds_point_3d_array(_3ds_bulk_array):
+    """Class representing an array of three-dimensional points for a 3ds file."""
+    __slots__ = ()
+    dtype = "<f4"
+    columns = 3
+
+
+class _3ds_point_uv_array(_3ds_bulk_array):
+    """Class representing an array of UV-coordinates for a 3ds file."""
+    __slots__ = ()
+    dtype = "<f4"
+    columns = 2
+
+
+class _3ds_face_array(_3ds_bulk_array):
+    """Class representing an array of triangles for a 3ds file, from their vertex indices."""
+    __slots__ = ()
+    dtype = "<u2"
+    columns = 4
+
+    def __init__(self, vindices):
+        vindices = self.convert(vindices).reshape(-1, 3)
+        # The last zero is only used by 3d studio
+        faces = np.zeros((len(vindices), 4), dtype=self.dtype)
+        faces[:, :3] = vindices
+        self.values = faces
+
+
+class _3ds_ushort_array(_3ds_bulk_array):
+    """Class representing an array of shorts for a 3ds file, such as the faces of a material."""
+    __slots__ = ()
+    dtype = "<u2"
+    columns = 1
+
+
 class _3ds_named_variable(object):
     """Convenience class for named variables."""
 
@@ -370,53 +444,67 @@ class _3ds_chunk(object):
 
     Chunks contain zero or more variables, followed by zero or more subchunks.
     """
-    __slots__ = "ID", "size", "variables", "subchunks"
+    __slots__ = "ID", "size", "variables", "subchunks", "parent", "valid"
 
     def __init__(self, chunk_id=0):
         self.ID = _3ds_ushort(chunk_id)
         self.size = _3ds_uint(0)
         self.variables = []
         self.subchunks = []
+        self.parent = None
+        # None until the size is computed, then whether all arrays fit their item counts
+        self.valid = None
+
+    def invalidate(self):
+        """Forget the cached size of this chunk and of the chunks containing it."""
+        chunk = self
+        while chunk is not None and chunk.valid is not None:
+            chunk.valid = None
+            chunk = chunk.parent
 
     def add_variable(self, name, var):
         """Add a named variable.
 
         The name is mostly for debugging purposes."""
         self.variables.append(_3ds_named_variable(name, var))
+        self.invalidate()
 
     def add_subchunk(self, chunk):
         """Add a subchunk."""
         self.subchunks.append(chunk)
+        chunk.parent = self
+        self.invalidate()
 
     def get_size(self):
         """Calculate the size of the chunk and return it.
 
-        The sizes of the variables and subchunks are used to determine this chunk\'s size."""
-        tmpsize = self.ID.get_size() + self.size.get_size()
-        for variable in self.variables:
-            tmpsize += variable.get_size()
-        for subchunk in self.subchunks:
-            tmpsize += subchunk.get_size()
-        self.size.value = tmpsize
+        The sizes of the variables and subchunks are used to determine this chunk\'s size.
+        Sizes are cached, only the chunks changed since the last call are visited again."""
+        if self.valid is None:
+            tmpsize = self.ID.get_size() + self.size.get_size()
+            valid = True
+            for variable in self.variables:
+                tmpsize += variable.get_size()
+                if isinstance(variable.value, (_3ds_array, _3ds_bulk_array)):
+                    valid = valid and variable.value.validate()
+            for subchunk in self.subchunks:
+                tmpsize += subchunk.get_size()
+                valid = valid and subchunk.valid
+            self.size.value = tmpsize
+            self.valid = valid
         return self.size.value
 
     def validate(self):
-        for var in self.variables:
-            func = getattr(var.value, "validate", None)
-            if (func is not None) and not func():
-                return False
-
-        for chunk in self.subchunks:
-            func = getattr(chunk, "validate", None)
-            if (func is not None) and not func():
-                return False
-
-        return True
+        """Check that no array of the chunk or its subchunks holds more than 65535 items."""
+        self.get_size()
+        return self.valid
 
     def write(self, file):
         """Write the chunk to a file.
 
         Uses the write function of the variables and the subchunks to do the actual work."""
+        # make sure the header holds the size, cached after the first call
+        self.get_size()
         # write header
         self.ID.write(file)
         self.size.write(file)
@@ -439,17 +527,68 @@ class _3ds_chunk(object):
             subchunk.dump(indent + 1)
 
 
+class _3ds_stream(object):
+    """Class writing chunks straight to a file, for the chunks too large to build in memory.
+
+    A chunk is opened with a placeholder size, its variables and subchunks are written as they
+    are made, and the size is patched when the chunk is closed:
+
+        with stream.chunk(OBJECTINFO):
+            stream.add_subchunk(object_chunk)
+    """
+    __slots__ = ("file", )
+
+    def __init__(self, file):
+        self.file = file
+
+    @contextmanager
+    def chunk(self, chunk_id):
+        """Open a chunk, everything written until the block exits is part of it."""
+        file = self.file
+        start = file.tell()
+        _3ds_ushort(chunk_id).write(file)
+        _3ds_uint(0).write(file)
+        yield self
+        end = file.tell()
+        file.seek(start + SZ_SHORT)
+        _3ds_uint(end - start).write(file)
+        file.seek(end)
+
+    def add_variable(self, name, var):
+        """Write a variable to the open chunk."""
+        var.write(self.file)
+
+    def add_subchunk(self, chunk):
+        """Write a complete subchunk to the open chunk."""
+        chunk.write(self.file)
+
+
 ######################################################
 # EXPORT
 ######################################################
 
 def get_material_image_texslots(material):
     # blender utility func.
+    # texture slots only exist before Blender 2.8, node based materials have none
     if material:
-        return [s for s in material.texture_slots if s and s.texture.type == 'IMAGE' and s.texture.image]
+        return [s for s in getattr(material, "texture_slots", ())
+                if s and s.texture.type == 'IMAGE' and s.texture.image]
 
     return []
 
+
+def get_material_diffuse_image(material):
+    """Return the image of the texture feeding the base color of a node based material, or None."""
+    if material and material.use_nodes:
+        from bpy_extras import node_shader_utils
+
+        wrapper = node_shader_utils.PrincipledBSDFWrapper(material, is_readonly=True)
+        texture = wrapper.base_color_texture
+        if texture is not None:
+            return texture.image
+
+    return None
+
     """
     images = []
     if material:
@@ -573,12 +712,15 @@ def make_material_chunk(material, image):
             make_material_subchunk(MATSPECULAR, (1.0, 1.0, 1.0)))
 
     else:
+        # diffuse_color has an alpha since Blender 2.8, which also dropped the ambient factor
+        diffuse = material.diffuse_color[:3]
+        ambient = getattr(material, "ambient", 0.0)
         material_chunk.add_subchunk(make_material_subchunk(
-            MATAMBIENT, (material.ambient * material.diffuse_color)[:]))
+            MATAMBIENT, [ambient * c for c in diffuse]))
         material_chunk.add_subchunk(make_material_subchunk(
-            MATDIFFUSE, material.diffuse_color[:]))
+            MATDIFFUSE, diffuse))
         material_chunk.add_subchunk(make_material_subchunk(
-            MATSPECULAR, material.specular_color[:]))
+            MATSPECULAR, material.specular_color[:3]))
 
         slots = get_material_image_texslots(material)  # can be None
 
@@ -617,205 +759,95 @@ def make_material_chunk(material, image):
                 if matmap:
                     material_chunk.add_subchunk(matmap)
 
-    return material_chunk
-
-
-class tri_wrapper(object):
-    """Class representing a triangle.
-
-    Used when converting faces to triangles"""
-
-    __slots__ = "vertex_index", "mat", "image", "faceuvs", "offset"
+        else:
+            # node based material, only the base color image has a 3DS map channel
+            matmap = make_material_texture_chunk(
+                MAT_DIFFUSEMAP, (), image or get_material_diffuse_image(material))
+            if matmap:
+                material_chunk.add_subchunk(matmap)
 
-    def __init__(self, vindex=(0, 0, 0), mat=None, image=None, faceuvs=None):
-        self.vertex_index = vindex
-        self.mat = mat
-        self.image = image
-        self.faceuvs = faceuvs
-        self.offset = [0, 0, 0]  # offset indices
+    return material_chunk
 
 
 def extract_triangles(mesh):
     """Extract triangles from a mesh.
 
-    If the mesh contains quads, they will be split into triangles."""
-    tri_list = []
-    do_uv = bool(mesh.tessface_uv_textures)
-
-    img = None
-    for i, face in enumerate(mesh.tessfaces):
-        f_v = face.vertices
+    Polygons are split into the triangles of mesh.loop_triangles. Returns the (triangles, 3)
+    vertex indices, the material index of every triangle and the (triangles, 3, 2) uv
+    coordinates of the triangle corners, or None when the mesh has no uv layer."""
+    mesh.calc_loop_triangles()
+    triangles = mesh.loop_triangles
+    tri_count = len(triangles)
 
-        uf = mesh.tessface_uv_textures.active.data[i] if do_uv else None
+    vertex_index = np.empty(tri_count * 3, dtype=np.int32)
+    triangles.foreach_get("vertices", vertex_index)
+    vertex_index.shape = (tri_count, 3)
 
-        if do_uv:
-            f_uv = uf.uv
-            img = uf.image if uf else None
-            if img is not None:
-                img = img.name
+    # out of range indices were reset by make_export_mesh
+    mat_index = np.empty(tri_count, dtype=np.int32)
+    triangles.foreach_get("material_index", mat_index)
 
-        # if f_v[3] == 0:
-        if len(f_v) == 3:
-            new_tri = tri_wrapper(
-                (f_v[0], f_v[1], f_v[2]), face.material_index, img)
-            if (do_uv):
-                new_tri.faceuvs = uv_key(f_uv[0]), uv_key(
-                    f_uv[1]), uv_key(f_uv[2])
-            tri_list.append(new_tri)
+    faceuvs = None
+    uv_layer = mesh.uv_layers.active
+    if uv_layer is not None:
+        loops = np.empty(tri_count * 3, dtype=np.int32)
+        triangles.foreach_get("loops", loops)
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uvs)
+        faceuvs = uvs.reshape(-1, 2)[loops].reshape(tri_count, 3, 2)
 
-        else:  # it's a quad
-            new_tri = tri_wrapper(
-                (f_v[0], f_v[1], f_v[2]), face.material_index, img)
-            new_tri_2 = tri_wrapper(
-                (f_v[0], f_v[2], f_v[3]), face.material_index, img)
+    return vertex_index, mat_index, faceuvs
 
-            if (do_uv):
-                new_tri.faceuvs = uv_key(f_uv[0]), uv_key(
-                    f_uv[1]), uv_key(f_uv[2])
-                new_tri_2.faceuvs = uv_key(f_uv[0]), uv_key(
-                    f_uv[2]), uv_key(f_uv[3])
 
-            tri_list.append(new_tri)
-            tri_list.append(new_tri_2)
-
-    return tri_list
-
-
-def remove_face_uv(verts, tri_list):
+def remove_face_uv(coords, vertex_index, faceuvs):
     """Remove face UV coordinates from a list of triangles.
 
     Since 3ds files only support one pair of uv coordinates for each vertex, face uv coordinates
     need to be converted to vertex uv coordinates. That means that vertices need to be duplicated when
-    there are multiple uv coordinates per vertex."""
-
-    # initialize a list of UniqueLists, one per vertex:
-    # uv_list = [UniqueList() for i in xrange(len(verts))]
-    unique_uvs = [{} for i in range(len(verts))]
-
-    # for each face uv coordinate, add it to the UniqueList of the vertex
-    for tri in tri_list:
-        for i in range(3):
-            # store the index into the UniqueList for future reference:
-            # offset.append(uv_list[tri.vertex_index[i]].add(_3ds_point_uv(tri.faceuvs[i])))
-
-            context_uv_vert = unique_uvs[tri.vertex_index[i]]
-            uvkey = tri.faceuvs[i]
-
-            offset_index__uv_3ds = context_uv_vert.get(uvkey)
-
-            if not offset_index__uv_3ds:
-                offset_index__uv_3ds = context_uv_vert[uvkey] = len(
-                    context_uv_vert), _3ds_point_uv(uvkey)
+    there are multiple uv coordinates per vertex.
 
-            tri.offset[i] = offset_index__uv_3ds[0]
+    coords holds the (vertices, 3) vertex coordinates, vertex_index the (triangles, 3) vertex
+    indices and faceuvs the (triangles, 3, 2) uv coordinates of the triangle corners. Returns the
+    split vertex array, the matching uv array and the (triangles, 3) indices of the split vertices."""
 
-    # At this point, each vertex has a UniqueList containing every uv coordinate that is associated with it
-    # only once.
+    # Every distinct (vertex, u, v) corner becomes one vertex of the 3ds mesh. Rounding merges
+    # the corners whose uv coordinates only differ by float noise.
+    corners = np.empty((vertex_index.size, 3), dtype=np.float64)
+    corners[:, 0] = vertex_index.ravel()
+    corners[:, 1:] = np.round(np.reshape(faceuvs, (-1, 2)), 6)
+    unique_corners, corner_vertex = np.unique(corners, axis=0, return_inverse=True)
 
-    # Now we need to duplicate every vertex as many times as it has uv coordinates and make sure the
-    # faces refer to the new face indices:
-    vert_index = 0
-    vert_array = _3ds_array()
-    uv_array = _3ds_array()
-    index_list = []
-    for i, vert in enumerate(verts):
-        index_list.append(vert_index)
+    # The unique corners are sorted by vertex, so the duplicates of a vertex stay together
+    vert_array = _3ds_point_3d_array(coords[unique_corners[:, 0].astype(np.intp)])
+    uv_array = _3ds_point_uv_array(unique_corners[:, 1:])
 
-        pt = _3ds_point_3d(vert.co)  # reuse, should be ok
-        uvmap = [None] * len(unique_uvs[i])
-        for ii, uv_3ds in unique_uvs[i].values():
-            # add a vertex duplicate to the vertex_array for every uv associated with this vertex:
-            vert_array.add(pt)
-            # add the uv coordinate to the uv array:
-            # This for loop does not give uv's ordered by ii, so we create a new map
-            # and add the uv's later
-            # uv_array.add(uv_3ds)
-            uvmap[ii] = uv_3ds
+    return vert_array, uv_array, corner_vertex.reshape(-1, 3)
 
-        # Add the uv's in the correct order
-        for uv_3ds in uvmap:
-            # add the uv coordinate to the uv array:
-            uv_array.add(uv_3ds)
 
-        vert_index += len(unique_uvs[i])
-
-    # Make sure the triangle vertex indices now refer to the new vertex list:
-    for tri in tri_list:
-        for i in range(3):
-            tri.offset[i] += index_list[tri.vertex_index[i]]
-        tri.vertex_index = tri.offset
-
-    return vert_array, uv_array, tri_list
-
-
-def make_faces_chunk(tri_list, mesh, materialDict):
+def make_faces_chunk(vertex_index, mat_index, mesh, materialDict):
     """Make a chunk for the faces.
 
-    Also adds subchunks assigning materials to all faces."""
+    vertex_index holds the (triangles, 3) vertex indices and mat_index the material index of
+    every triangle. Also adds subchunks assigning materials to all faces."""
 
     materials = mesh.materials
-    if not materials:
-        mat = None
 
     face_chunk = _3ds_chunk(OBJECT_FACES)
-    face_list = _3ds_array()
+    face_chunk.add_variable("faces", _3ds_face_array(vertex_index))
 
-    if mesh.tessface_uv_textures:
-        # Gather materials used in this mesh - mat/image pairs
-        unique_mats = {}
-        for i, tri in enumerate(tri_list):
+    # faces of each material, in one pass over the material indices
+    order = np.argsort(mat_index, kind="stable")
+    used, starts = np.unique(mat_index[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
 
-            face_list.add(_3ds_face(tri.vertex_index))
+    for i, start, end in zip(used.tolist(), starts.tolist(), ends.tolist()):
+        mat = materials[i] if materials else None
+        name_str = mat.name if mat else "None"
 
-            if materials:
-                mat = materials[tri.mat]
-                if mat:
-                    mat = mat.name
-
-            img = tri.image
-
-            try:
-                context_mat_face_array = unique_mats[mat, img][1]
-            except:
-                name_str = mat if mat else "None"
-                if img:
-                    name_str += img
-
-                context_mat_face_array = _3ds_array()
-                unique_mats[mat, img] = _3ds_string(
-                    sane_name(name_str)), context_mat_face_array
-
-            context_mat_face_array.add(_3ds_ushort(i))
-            # obj_material_faces[tri.mat].add(_3ds_ushort(i))
-
-        face_chunk.add_variable("faces", face_list)
-        for mat_name, mat_faces in unique_mats.values():
-            obj_material_chunk = _3ds_chunk(OBJECT_MATERIAL)
-            obj_material_chunk.add_variable("name", mat_name)
-            obj_material_chunk.add_variable("face_list", mat_faces)
-            face_chunk.add_subchunk(obj_material_chunk)
-
-    else:
-
-        obj_material_faces = []
-        obj_material_names = []
-        for m in materials:
-            if m:
-                obj_material_names.append(_3ds_string(sane_name(m.name)))
-                obj_material_faces.append(_3ds_array())
-        n_materials = len(obj_material_names)
-
-        for i, tri in enumerate(tri_list):
-            face_list.add(_3ds_face(tri.vertex_index))
-            if (tri.mat < n_materials):
-                obj_material_faces[tri.mat].add(_3ds_ushort(i))
-
-        face_chunk.add_variable("faces", face_list)
-        for i in range(n_materials):
-            obj_material_chunk = _3ds_chunk(OBJECT_MATERIAL)
-            obj_material_chunk.add_variable("name", obj_material_names[i])
-            obj_material_chunk.add_variable("face_list", obj_material_faces[i])
-            face_chunk.add_subchunk(obj_material_chunk)
+        obj_material_chunk = _3ds_chunk(OBJECT_MATERIAL)
+        obj_material_chunk.add_variable("name", _3ds_string(sane_name(name_str)))
+        obj_material_chunk.add_variable("face_list", _3ds_ushort_array(order[start:end]))
+        face_chunk.add_subchunk(obj_material_chunk)
 
     return face_chunk
 
@@ -842,21 +874,52 @@ def make_matrix_4x3_chunk(matrix):
     return matrix_chunk
 
 
+def get_material_indices(mesh):
+    """Return the material index of every polygon of a mesh, out of range indices replaced by 0."""
+    mat_index = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", mat_index)
+    # Why 0 Why!
+    mat_index[mat_index >= len(mesh.materials)] = 0
+    return mat_index
+
+
+def make_export_mesh(depsgraph, ob, matrix):
+    """Convert an object to a temporary mesh in export space, or return None.
+
+    The mesh belongs to the evaluated object, release it with free_export_mesh."""
+    try:
+        data = ob.evaluated_get(depsgraph).to_mesh()
+    except RuntimeError:
+        data = None
+
+    if data:
+        data.transform(matrix)
+        data.polygons.foreach_set("material_index", get_material_indices(data))
+
+    return data
+
+
+def free_export_mesh(depsgraph, ob):
+    """Release the mesh made by make_export_mesh."""
+    ob.evaluated_get(depsgraph).to_mesh_clear()
+
+
 def make_mesh_chunk(mesh, matrix, materialDict):
     """Make a chunk out of a Blender mesh."""
 
     # Extract the triangles from the mesh:
-    tri_list = extract_triangles(mesh)
+    vertex_index, mat_index, faceuvs = extract_triangles(mesh)
+
+    coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coords)
+    coords.shape = (-1, 3)
 
-    if mesh.tessface_uv_textures:
+    if faceuvs is not None:
         # Remove the face UVs and convert it to vertex UV:
-        vert_array, uv_array, tri_list = remove_face_uv(
-            mesh.vertices, tri_list)
+        vert_array, uv_array, vertex_index = remove_face_uv(coords, vertex_index, faceuvs)
     else:
         # Add the vertices to the vertex array:
-        vert_array = _3ds_array()
-        for vert in mesh.vertices:
-            vert_array.add(_3ds_point_3d(vert.co))
+        vert_array = _3ds_point_3d_array(coords)
         # no UV at all:
         uv_array = None
 
@@ -867,7 +930,7 @@ def make_mesh_chunk(mesh, matrix, materialDict):
     mesh_chunk.add_subchunk(make_vert_chunk(vert_array))
     # add faces chunk:
 
-    mesh_chunk.add_subchunk(make_faces_chunk(tri_list, mesh, materialDict))
+    mesh_chunk.add_subchunk(make_faces_chunk(vertex_index, mat_index, mesh, materialDict))
 
     # if available, add uv chunk:
     if uv_array:
@@ -1012,12 +1075,11 @@ def save(operator,
     import mathutils
 
     import time
-    from bpy_extras.io_utils import create_derived_objects, free_derived_objects
 
     """Save the Blender scene to a 3ds file."""
 
     # Time the export
-    time1 = time.clock()
+    time1 = time.perf_counter()
     # Blender.Window.WaitCursor(1)
 
     if global_matrix is None:
@@ -1026,95 +1088,48 @@ def save(operator,
     if bpy.ops.object.mode_set.poll():
         bpy.ops.object.mode_set(mode='OBJECT')
 
-    # Initialize the main chunk (primary):
-    primary = _3ds_chunk(PRIMARY)
-    # Add version chunk:
-    version_chunk = _3ds_chunk(VERSION)
-    version_chunk.add_variable("version", _3ds_uint(3))
-    primary.add_subchunk(version_chunk)
-
-    # init main object info chunk:
-    object_info = _3ds_chunk(OBJECTINFO)
-
-    ''' # COMMENTED OUT FOR 2.42 RELEASE!! CRASHES 3DS MAX
-    # init main key frame data chunk:
-    kfdata = make_kfdata()
-    '''
-
     # Make a list of all materials used in the selected meshes (use a dictionary,
     # each material is added once):
     materialDict = {}
     mesh_objects = []
 
-    scene = context.scene
-
-    if use_selection:
-        objects = (ob for ob in scene.objects if ob.is_visible(
-            scene) and ob.select)
-    else:
-        objects = (ob for ob in scene.objects if ob.is_visible(scene))
+    depsgraph = context.evaluated_depsgraph_get()
 
-    for ob in objects:
-        # get derived objects
-        free, derived = create_derived_objects(scene, ob)
-
-        if derived is None:
+    # The materials are written before the objects, so gather them first. The meshes are
+    # released right away and converted again when their object is written.
+    for instance in depsgraph.object_instances:
+        # instances are filtered by the object instancing them
+        ob = (instance.parent if instance.is_instance else instance.object).original
+        if not ob.visible_get() or (use_selection and not ob.select_get()):
             continue
 
-        for ob_derived, mat in derived:
-            if ob.type not in {'MESH', 'CURVE', 'SURFACE', 'FONT', 'META'}:
-                continue
+        ob_derived = instance.object.original
+        if ob_derived.type not in {'MESH', 'CURVE', 'SURFACE', 'FONT', 'META'}:
+            continue
 
+        # Only the material indices are needed here: meshes are read as evaluated, the
+        # other types are converted but not transformed
+        ob_eval = ob_derived.evaluated_get(depsgraph)
+        if ob_derived.type == 'MESH':
+            data = ob_eval.data
+        else:
             try:
-                data = ob_derived.to_mesh(scene, True, 'PREVIEW')
-            except:
+                data = ob_eval.to_mesh()
+            except RuntimeError:
                 data = None
 
-            if data:
-                matrix = global_matrix * mat
-                data.transform(matrix)
-                mesh_objects.append((ob_derived, data, matrix))
-                mat_ls = data.materials
-                mat_ls_len = len(mat_ls)
-
-                # get material/image tuples.
-                if data.tessface_uv_textures:
-                    if not mat_ls:
-                        mat = mat_name = None
-
-                    for f, uf in zip(data.tessfaces, data.tessface_uv_textures.active.data):
-                        if mat_ls:
-                            mat_index = f.material_index
-                            if mat_index >= mat_ls_len:
-                                mat_index = f.mat = 0
-                            mat = mat_ls[mat_index]
-                            mat_name = None if mat is None else mat.name
-                        # else there already set to none
-
-                        img = uf.image
-                        img_name = None if img is None else img.name
-
-                        materialDict.setdefault(
-                            (mat_name, img_name), (mat, img))
-
-                else:
-                    for mat in mat_ls:
-                        if mat:  # material may be None so check its not.
-                            materialDict.setdefault(
-                                (mat.name, None), (mat, None))
-
-                    # Why 0 Why!
-                    for f in data.tessfaces:
-                        if f.material_index >= mat_ls_len:
-                            f.material_index = 0
-
-        if free:
-            free_derived_objects(ob)
-
-    # Make material chunks for all materials used in the meshes:
-    for mat_and_image in materialDict.values():
-        object_info.add_subchunk(make_material_chunk(
-            mat_and_image[0], mat_and_image[1]))
+        if data:
+            mesh_objects.append((ob_derived, global_matrix @ instance.matrix_world))
+            mat_ls = data.materials
+
+            # get the materials used by the faces, the same way make_faces_chunk names them
+            for i in np.unique(get_material_indices(data)).tolist():
+                mat = mat_ls[i] if mat_ls else None
+                mat_name = None if mat is None else mat.name
+                materialDict.setdefault((mat_name, None), (mat, None))
+
+        if ob_derived.type != 'MESH':
+            ob_eval.to_mesh_clear()
 
     # Give all objects a unique ID and build a dictionary from object name to object id:
     """
@@ -1125,67 +1140,72 @@ def save(operator,
     #    name_to_id[ob.name]= len(name_to_id)
     """
 
-    # Create object chunks for all meshes:
-    i = 0
-    for ob, blender_mesh, matrix in mesh_objects:
-        # create a new object chunk
-        object_chunk = _3ds_chunk(OBJECT)
-
-        # set the object name
-        object_chunk.add_variable("name", _3ds_string(sane_name(ob.name)))
-
-        # make a mesh chunk out of the mesh:
-        object_chunk.add_subchunk(make_mesh_chunk(
-            blender_mesh, matrix, materialDict))
-
-        # ensure the mesh has no over sized arrays
-        # skip ones that do!, otherwise we cant write since the array size wont
-        # fit into USHORT.
-        if object_chunk.validate():
-            object_info.add_subchunk(object_chunk)
-        else:
-            operator.report(
-                {'WARNING'}, "Object %r can't be written into a 3DS file")
-
-        ''' # COMMENTED OUT FOR 2.42 RELEASE!! CRASHES 3DS MAX
-        # make a kf object node for the object:
-        kfdata.add_subchunk(make_kf_obj_node(ob, name_to_id))
-        '''
-
-        if not blender_mesh.users:
-            bpy.data.meshes.remove(blender_mesh)
-        # blender_mesh.vertices = None
-
-        i += i
-
-    # Create chunks for all empties:
-    ''' # COMMENTED OUT FOR 2.42 RELEASE!! CRASHES 3DS MAX
-    for ob in empty_objects:
-        # Empties only require a kf object node:
-        kfdata.add_subchunk(make_kf_obj_node(ob, name_to_id))
-        pass
-    '''
-
-    # Add main object info chunk to primary chunk:
-    primary.add_subchunk(object_info)
-
     ''' # COMMENTED OUT FOR 2.42 RELEASE!! CRASHES 3DS MAX
-    # Add main keyframe data chunk to primary chunk:
-    primary.add_subchunk(kfdata)
+    # init main key frame data chunk:
+    kfdata = make_kfdata()
     '''
 
-    # At this point, the chunk hierarchy is completely built.
-
-    # Check the size:
-    primary.get_size()
-    # Open the file for writing:
-    file = open(filepath, 'wb')
-
-    # Recursively write the chunks to file:
-    primary.write(file)
-
-    # Close the file:
-    file.close()
+    # Open the file for writing. Chunks are written as soon as they are made, so only one
+    # object is held in memory at a time:
+    with open(filepath, 'wb') as file:
+        stream = _3ds_stream(file)
+
+        # The main chunk (primary):
+        with stream.chunk(PRIMARY):
+            # Add version chunk:
+            version_chunk = _3ds_chunk(VERSION)
+            version_chunk.add_variable("version", _3ds_uint(3))
+            stream.add_subchunk(version_chunk)
+
+            # The main object info chunk:
+            with stream.chunk(OBJECTINFO):
+                # Make material chunks for all materials used in the meshes:
+                for mat_and_image in materialDict.values():
+                    stream.add_subchunk(make_material_chunk(
+                        mat_and_image[0], mat_and_image[1]))
+
+                # Create object chunks for all meshes:
+                for ob, matrix in mesh_objects:
+                    blender_mesh = make_export_mesh(depsgraph, ob, matrix)
+                    if not blender_mesh:
+                        continue
+
+                    # create a new object chunk
+                    object_chunk = _3ds_chunk(OBJECT)
+
+                    # set the object name
+                    object_chunk.add_variable("name", _3ds_string(sane_name(ob.name)))
+
+                    # make a mesh chunk out of the mesh:
+                    object_chunk.add_subchunk(make_mesh_chunk(
+                        blender_mesh, matrix, materialDict))
+
+                    # ensure the mesh has no over sized arrays
+                    # skip ones that do!, otherwise we cant write since the array size wont
+                    # fit into USHORT.
+                    if object_chunk.validate():
+                        stream.add_subchunk(object_chunk)
+                    else:
+                        operator.report(
+                            {'WARNING'}, "Object %r can't be written into a 3DS file" % ob.name)
+
+                    ''' # COMMENTED OUT FOR 2.42 RELEASE!! CRASHES 3DS MAX
+                    # make a kf object node for the object:
+                    kfdata.add_subchunk(make_kf_obj_node(ob, name_to_id))
+                    '''
+
+                    free_export_mesh(depsgraph, ob)
+
+            # Create chunks for all empties:
+            ''' # COMMENTED OUT FOR 2.42 RELEASE!! CRASHES 3DS MAX
+            for ob in empty_objects:
+                # Empties only require a kf object node:
+                kfdata.add_subchunk(make_kf_obj_node(ob, name_to_id))
+                pass
+
+            # Add main keyframe data chunk to primary chunk:
+            stream.add_subchunk(kfdata)
+            '''
 
     # Clear name mapping vars, could make locals too
     del name_unique[:]
@@ -1193,9 +1213,6 @@ def save(operator,
 
     # Debugging only: report the exporting time:
     # Blender.Window.WaitCursor(0)
-    print("3ds export time: %.2f" % (time.clock() - time1))
-
-    # Debugging only: dump the chunk hierarchy:
-    # primary.dump()
+    print("3ds export time: %.2f" % (time.perf_counter() - time1))
 
     return {'FINISHED'}
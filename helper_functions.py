@@ -1,7 +1,33 @@
 import bpy
-import struct
+import mathutils
 
-from . import localspace_variable_names
+import numpy as np
+
+from . import scene_3ds
+from . import texture_3ds
+
+# Template materials, one per node graph shape, kept for the whole session
+MATERIAL_TEMPLATES = {}
+
+MAPTO_INPUTS = {
+    'COLOR': 'Base Color',
+    'SPECULARITY': 'Specular',
+    'ALPHA': 'Alpha',
+    'NORMAL': 'Normal'
+}
+
+EXTENSION_MODES = {
+    'wrap': 'REPEAT',
+    'mirror': 'MIRROR',
+    'decal': 'CLIP'
+}
+
+# Custom properties tagging proxy objects with the chunk of their real mesh
+PROXY_FILEPATH = "3ds_filepath"
+PROXY_OFFSET = "3ds_offset"
+# Custom property tagging the materials loaded for proxies with their name in the file,
+# together with PROXY_FILEPATH
+PROXY_MATERIAL = "3ds_material"
 
 
 def deselect_all_objects():
@@ -39,32 +65,50 @@ def add_vertices_to_mesh(mesh, vertices):
 
     Args:
     mesh (bpy.types.Mesh): Mesh to add vertices to.
-    vertices (list of float): List of vertex coordinates.
+    vertices (numpy.ndarray): (N, 3) float32 array of vertex coordinates.
 
     Returns: None
     """
-    mesh.vertices.add(len(vertices) // 3)
-    mesh.vertices.foreach_set("co", vertices)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.ravel())
+
+
+def fix_face_winding(faces):
+    """
+    Rotates every face whose third vertex index is 0 so that it comes first,
+    since Blender doesn't accept a 0 in the last loop of a triangle.
+
+    Args:
+    faces (numpy.ndarray): (F, 3) uint16 array of vertex indices per face.
+
+    Returns:
+    numpy.ndarray: (F, 3) int32 array of vertex indices per loop, shared by
+    add_faces_to_mesh and set_uv so both use the same winding.
+    """
+    face_loops = faces.astype(np.int32)
+    rotate = face_loops[:, 2] == 0
+    face_loops[rotate] = np.roll(face_loops[rotate], 1, axis=1)
+    return face_loops
 
 
-def add_faces_to_mesh(mesh, faces):
+def add_faces_to_mesh(mesh, face_loops):
     """
-    Adds faces to a mesh.
+    Adds triangular faces to a mesh.
 
     Args:
     mesh (bpy.types.Mesh): Mesh to add faces to.
-    faces (list of int): List of face indices.
+    face_loops (numpy.ndarray): (F, 3) int32 array from fix_face_winding.
 
     Returns: None
     """
-    mesh.polygons.add(len(faces))
-    mesh.loops.add(len(faces) * 3)
-    rearranged_faces = [(v3, v1, v2) if v3 == 0 else (v1, v2, v3)
-                        for v1, v2, v3 in faces]
-    mesh.polygons.foreach_set("loop_start", range(0, len(faces) * 3, 3))
-    mesh.polygons.foreach_set("loop_total", (3,) * len(faces))
-    mesh.loops.foreach_set(
-        "vertex_index", [vertex for face in rearranged_faces for vertex in face])
+    num_faces = len(face_loops)
+    mesh.polygons.add(num_faces)
+    mesh.loops.add(num_faces * 3)
+    mesh.polygons.foreach_set(
+        "loop_start", np.arange(0, num_faces * 3, 3, dtype=np.int32))
+    mesh.polygons.foreach_set(
+        "loop_total", np.full(num_faces, 3, dtype=np.int32))
+    mesh.loops.foreach_set("vertex_index", face_loops.ravel())
 
 
 def add_uv_layer(mesh):
@@ -75,24 +119,23 @@ def add_uv_layer(mesh):
     mesh (bpy.types.Mesh): Mesh to add UV layer to.
 
     Returns:
-    list: UV data of the newly added UV layer.
+    bpy.types.MeshUVLoopLayer: The newly added UV layer.
     """
-    mesh.uv_layers.new()
-    return mesh.uv_layers.active.data[:]
+    return mesh.uv_layers.new()
 
 
-def assign_material(mesh, materials, MATDICT, TEXTURE_DICT):
+def assign_material(mesh, materials, MATDICT):
     """
     Assigns materials to a mesh.
 
     Args:
     mesh (bpy.types.Mesh): Mesh to assign materials to.
-    materials (list of str): List of material names.
+    materials (list of tuple): List of (material name, uint16 array of face indices) pairs.
     MATDICT (dict): Dictionary for mapping material names to materials.
-    TEXTURE_DICT (dict): Dictionary for mapping material names to textures.
 
     Returns: None
     """
+    material_indices = np.zeros(len(mesh.polygons), dtype=np.int32)
     for idx, (matName, faces) in enumerate(materials):
         bmat = MATDICT.get(matName)
         if not bmat:
@@ -100,35 +143,54 @@ def assign_material(mesh, materials, MATDICT, TEXTURE_DICT):
             MATDICT[matName] = bmat
             print(f"Warning: material {matName} not defined!")
         mesh.materials.append(bmat)
-        img = TEXTURE_DICT.get(bmat.name)
-        for fidx in faces:
-            mesh.polygons[fidx].material_index = idx
-            if img:
-                bmat.use_nodes = True
-                tex_image = bmat.node_tree.nodes.new('ShaderNodeTexImage')
-                tex_image.image = img
-                bmat.node_tree.nodes['Principled BSDF'].inputs[0].default_value = bmat.node_tree.nodes['Image Texture'].outputs[0].default_value
+        material_indices[faces] = idx
+    mesh.polygons.foreach_set("material_index", material_indices)
 
 
-def set_uv(mesh, faces, contextMeshUV):
+def set_uv(mesh, face_loops, contextMeshUV):
     """
-    Sets the UV coordinates for a mesh.
+    Sets the UV coordinates for a mesh by expanding the per-vertex UVs to
+    per-loop UVs in one gather.
 
     Args:
     mesh (bpy.types.Mesh): Mesh to set UV coordinates for.
-    faces (list of int): List of face indices.
-    contextMeshUV (list of float): List of UV coordinates.
+    face_loops (numpy.ndarray): (F, 3) int32 array from fix_face_winding.
+    contextMeshUV (numpy.ndarray): (N, 2) float32 array of per-vertex UV coordinates.
 
     Returns: None
     """
-    uvl = mesh.uv_layers.active.data[:]
-    for idx, polygon in enumerate(mesh.polygons):
-        v1, v2, v3 = faces[idx]
-        if v3 == 0:
-            v1, v2, v3 = v3, v1, v2
-        uv_coords = [contextMeshUV[v * 2: (v * 2) + 2] for v in (v1, v2, v3)]
-        for i, uv_coord in enumerate(uv_coords):
-            uvl[polygon.loop_start + i].uv = uv_coord
+    loop_uvs = contextMeshUV[face_loops.ravel()]
+    mesh.uv_layers.active.data.foreach_set("uv", loop_uvs.ravel())
+
+
+def load_texture(texture_name, prefetch):
+    """
+    Loads the image of a texture, waiting for its prefetch to complete.
+    Images already loaded from the same unchanged file during the session
+    are reused.
+
+    Args:
+    texture_name (str): File name read from a MAT_MAP_FILEPATH chunk.
+    prefetch (TexturePrefetch): Prefetcher the texture file was queued on.
+
+    Returns:
+    bpy.types.Image: The loaded image, or None if the file wasn't found.
+    """
+    from bpy_extras.image_utils import load_image
+
+    path = prefetch.result(texture_name)
+    if path is None:
+        return None
+
+    image = texture_3ds.IMAGE_CACHE.get(path)
+    if image is None:
+        image = load_image(path, prefetch.dirname, place_holder=False)
+        if image is not None:
+            for evicted in texture_3ds.IMAGE_CACHE.add(path, image):
+                # Free evicted images nothing uses anymore
+                if evicted.users == 0:
+                    bpy.data.images.remove(evicted)
+    return image
 
 
 def add_object_to_scene(mesh, name):
@@ -147,244 +209,221 @@ def add_object_to_scene(mesh, name):
     return obj
 
 
-def set_matrix(obj, matrix):
+def create_proxy(name, bounds, filepath, offset):
     """
-    Sets the transformation matrix for an object.
+    Creates a wireframe box object standing in for an OBJECT of a file,
+    tagged with the file and chunk to load the real mesh from.
 
     Args:
-    obj (bpy.types.Object): Object to set the transformation matrix for.
-    matrix (mathutils.Matrix): Transformation matrix to apply to the object.
+    name (str): Name of the object.
+    bounds (tuple): (min x, min y, min z, max x, max y, max z) of the vertices.
+    filepath (str): Path of the 3DS file.
+    offset (int): Offset of the OBJECT chunk in the file.
 
-    Returns: None
+    Returns:
+    bpy.types.Object: The created object.
     """
-    if matrix:
-        obj.matrix_local = matrix.copy()
+    corners = np.array(bounds, dtype=np.float32).reshape(2, 3)
+    vertices = scene_3ds.box_corners(corners[0], corners[1])
+    faces = ((0, 2, 3, 1), (4, 5, 7, 6), (0, 1, 5, 4), (2, 6, 7, 3), (0, 4, 6, 2), (1, 3, 7, 5))
 
+    mesh = create_new_mesh(name)
+    mesh.from_pydata(vertices.tolist(), [], faces)
+    mesh.update()
 
-def add_texture_to_material(image, texture, scale, offset, extension, material, mapto):
-    """
-    Adds an image texture to a material, configures its scale and mapping, 
-    and connects it to the appropriate shader input.
+    obj = add_object_to_scene(mesh, name)
+    obj.display_type = 'WIRE'
+    obj[PROXY_FILEPATH] = filepath
+    obj[PROXY_OFFSET] = offset
+    return obj
 
-    Args:
-    image (bpy.types.Image): Image to use as a texture.
-    texture (bpy.types.Texture): Texture to apply to the material.
-    scale (tuple): Tuple (u_scale, v_scale) to scale the texture.
-    offset (tuple): Tuple (u_offset, v_offset) to offset the texture.
-    extension (str): Type of texture extension ("mirror", "decal").
-    material (bpy.types.Material): Material to apply the texture to.
-    mapto (str): Type of mapping to use ("COLOR", "SPECULARITY", "ALPHA", "NORMAL").
 
-    Returns: None
+def matrix_from_4x3(data):
     """
-    mapto_mapping = {
-        'COLOR': 'Base Color',
-        'SPECULARITY': 'Specular',
-        'ALPHA': 'Alpha',
-        'NORMAL': 'Normal'
-    }
+    Converts the 12 floats of an OBJECT_TRANS_MATRIX chunk to a matrix.
 
-    if mapto not in mapto_mapping.keys():
-        print(
-            "\tError: Cannot map to %r\n\tassuming diffuse color. modify material %r later." %
-            (mapto, material.name)
-        )
-        mapto = "COLOR"
-
-    if image:
-        texture.image = image
-
-    material.use_nodes = True
-    bsdf = material.node_tree.nodes["Principled BSDF"]
-
-    tex_image = material.node_tree.nodes.new('ShaderNodeTexImage')
-    tex_image.image = texture.image
-    tex_image.location = (-300, 300)
-
-    # Add mapping node and texture coordinate node
-    tex_coord = material.node_tree.nodes.new('ShaderNodeTexCoord')
-    mapping = material.node_tree.nodes.new('ShaderNodeMapping')
-
-    # Connect texture coordinate to mapping input
-    material.node_tree.links.new(
-        mapping.inputs['Vector'], tex_coord.outputs['UV'])
-
-    # Connect mapping output to image texture input
-    material.node_tree.links.new(
-        tex_image.inputs['Vector'], mapping.outputs['Vector'])
-
-    # Set the scale values
-    mapping.inputs['Scale'].default_value[0] = scale[0]
-    mapping.inputs['Scale'].default_value[1] = scale[1]
-
-    material.node_tree.links.new(
-        bsdf.inputs[mapto_mapping[mapto]], tex_image.outputs['Color'])
+    Args:
+    data (tuple): The rows of the 4x3 matrix as stored in the file.
 
-    if extension == 'mirror':
-        # To implement mirror or decal extension, additional logic is required.
-        pass
-    elif extension == 'decal':
-        pass
+    Returns:
+    mathutils.Matrix: The 4x4 transformation matrix.
+    """
+    row1 = list(data[:3]) + [0]
+    row2 = list(data[3:6]) + [0]
+    row3 = list(data[6:9]) + [0]
+    row4 = list(data[9:]) + [1]
+    return mathutils.Matrix((row1, row2, row3, row4)).transposed()
 
 
-def read_chunk(file, chunk):
+def set_matrix(obj, matrix):
     """
-    Reads a chunk of data from the given file.
+    Sets the transformation matrix for an object.
 
     Args:
-    file (file): File to read data from.
-    chunk (Chunk): Chunk object that holds the ID, length, and bytes read of the data chunk.
+    obj (bpy.types.Object): Object to set the transformation matrix for.
+    matrix (mathutils.Matrix): Transformation matrix to apply to the object.
 
     Returns: None
     """
-    temp_data = file.read(struct.calcsize(chunk.binary_format))
-    data = struct.unpack(chunk.binary_format, temp_data)
-    chunk.ID = data[0]
-    chunk.length = data[1]
-    chunk.bytes_read = 6  # update the bytes read function
+    if matrix:
+        obj.matrix_local = matrix.copy()
 
 
-def read_string(file):
+def create_material_template(signature):
     """
-    Reads a null-terminated string from a file.
+    Builds the node graph for one material signature: a Principled BSDF
+    with an image texture and mapping node per map channel, all fed by a
+    shared UV texture coordinate node.
 
     Args:
-    file (file): File to read the string from.
+    signature (tuple): Signature as returned by Material3DS.signature().
 
     Returns:
-    tuple: A tuple (string, length), where 'string' is the read string and 'length' is the length of the string plus one for the null character.
+    bpy.types.Material: The template material.
     """
-    s = []
-    while True:
-        c = file.read(1)
-        if c == b'\x00':
-            break
-        s.append(c)
-    return str(b''.join(s), "utf-8", "replace"), len(s) + 1
+    maps, use_alpha = signature
 
+    template = bpy.data.materials.new("3DS Template")
+    template.use_nodes = True
+    nodes = template.node_tree.nodes
+    links = template.node_tree.links
+    bsdf = nodes["Principled BSDF"]
 
-def read_float_color(file, temp_chunk):
-    """
-    Reads a three float color value from a file.
+    if maps:
+        tex_coord = nodes.new('ShaderNodeTexCoord')
+        tex_coord.location = (-900, 300)
 
-    Args:
-    file (file): File to read the float color from.
-    temp_chunk (Chunk3DS): The current chunk being processed.
+    for index, (mapto, extension) in enumerate(maps):
+        mapping = nodes.new('ShaderNodeMapping')
+        mapping.name = "3DS Mapping %d" % index
+        mapping.location = (-700, 300 - 300 * index)
 
-    Returns:
-    list: A list of three floats representing the color.
-    """
-    data_size = localspace_variable_names.STRUCT_SIZE_3FLOAT
-    temp_data = file.read(data_size)
-    temp_chunk.bytes_read += data_size
-    return [float(col) for col in struct.unpack('<3f', temp_data)]
+        tex_image = nodes.new('ShaderNodeTexImage')
+        tex_image.name = "3DS Image %d" % index
+        tex_image.location = (-400, 300 - 300 * index)
+        try:
+            tex_image.extension = EXTENSION_MODES[extension]
+        except TypeError:
+            # 'MIRROR' is only available from Blender 3.5 on
+            pass
 
+        links.new(mapping.inputs['Vector'], tex_coord.outputs['UV'])
+        links.new(tex_image.inputs['Vector'], mapping.outputs['Vector'])
+        links.new(bsdf.inputs[MAPTO_INPUTS[mapto]], tex_image.outputs['Color'])
 
-def skip_to_end(file, skip_chunk):
-    """
-    Skips to the end of a chunk in a file.
+    if use_alpha:
+        template.blend_method = 'BLEND'
 
-    Args:
-    file (file): File to skip through.
-    skip_chunk (Chunk3DS): The chunk to skip.
-    """
-    buffer_size = skip_chunk.length - skip_chunk.bytes_read
-    file.read(buffer_size)
-    skip_chunk.bytes_read += buffer_size
+    return template
 
 
-def read_float(file, temp_chunk):
+def get_material_template(signature):
     """
-    Reads a float from a file.
+    Returns the template material for a signature, building it on first use.
+    Templates are kept for the whole session and rebuilt if they were removed,
+    for instance when a new .blend file is loaded.
 
     Args:
-    file (file): File to read the float from.
-    temp_chunk (Chunk3DS): The current chunk being processed.
+    signature (tuple): Signature as returned by Material3DS.signature().
 
     Returns:
-    float: The float read from the file.
+    bpy.types.Material: The template material.
     """
-    data_size = localspace_variable_names.STRUCT_SIZE_FLOAT
-    temp_data = file.read(data_size)
-    temp_chunk.bytes_read += data_size
-    return struct.unpack('<f', temp_data)[0]
+    template = MATERIAL_TEMPLATES.get(signature)
+    if template is not None:
+        try:
+            template.name
+        except ReferenceError:
+            template = None
+
+    if template is None:
+        template = MATERIAL_TEMPLATES[signature] = create_material_template(signature)
+    return template
 
 
-def read_short(file, temp_chunk):
+def build_material(material_3ds):
     """
-    Reads an unsigned short from a file.
+    Creates a Blender material by copying the template for its signature and
+    setting the values specific to this material.
 
     Args:
-    file (file): File to read the short from.
-    temp_chunk (Chunk3DS): The current chunk being processed.
+    material_3ds (Material3DS): Material data read from the file.
 
     Returns:
-    int: The unsigned short read from the file.
+    bpy.types.Material: The created material.
     """
-    data_size = localspace_variable_names.STRUCT_SIZE_UNSIGNED_SHORT
-    temp_data = file.read(data_size)
-    temp_chunk.bytes_read += data_size
-    return struct.unpack('<H', temp_data)[0]
+    material = get_material_template(material_3ds.signature()).copy()
+    material.name = material_3ds.name
 
+    nodes = material.node_tree.nodes
+    bsdf = nodes["Principled BSDF"]
 
-def read_byte_color(file, temp_chunk):
-    """
-    Reads a byte-based color from a file and converts it to a float-based color.
+    if material_3ds.ambient is not None:
+        material.diffuse_color = material_3ds.ambient + [1.0]  # Add alpha
+        bsdf.inputs["Specular"].default_value = 1.0
+        bsdf.inputs["Roughness"].default_value = 0.0
 
-    Args:
-    file (file): File to read the color from.
-    temp_chunk (Chunk3DS): The current chunk being processed.
+    if material_3ds.diffuse is not None:
+        material.diffuse_color = material_3ds.diffuse + [1.0]  # Add alpha
+        bsdf.inputs["Base Color"].default_value = material.diffuse_color
 
-    Returns:
-    list: A list of three floats representing the color.
-    """
-    temp_data = file.read(struct.calcsize('3B'))
-    temp_chunk.bytes_read += 3
-    return [float(col) / 255 for col in struct.unpack('<3B', temp_data)]
+    if material_3ds.specular is not None:
+        material.specular_color = material_3ds.specular
+
+    if material_3ds.alpha is not None:
+        bsdf.inputs["Alpha"].default_value = material_3ds.alpha
+
+    for index, texture_map in enumerate(material_3ds.maps):
+        scale = nodes["3DS Mapping %d" % index].inputs['Scale'].default_value
+        scale[0], scale[1] = texture_map.scale
 
+    return material
 
-def read_int(file, temp_chunk):
+
+def assign_material_images(material, material_3ds, prefetch):
     """
-    Reads an integer from a file.
+    Sets the images of a material built by build_material, once their files
+    have been prefetched. Maps whose file wasn't found are removed, so they
+    don't override the material colors.
 
     Args:
-    file (file): File to read the integer from.
-    temp_chunk (Chunk3DS): The current chunk being processed.
+    material (bpy.types.Material): Material to set the images of.
+    material_3ds (Material3DS): Material data read from the file.
+    prefetch (TexturePrefetch): Prefetcher the texture files were queued on.
 
-    Returns:
-    int: The integer read from the file.
+    Returns: None
     """
-    data_size = struct.calcsize('I')
-    temp_data = file.read(data_size)
-    temp_chunk.bytes_read += data_size
-    return struct.unpack('<I', temp_data)[0]
+    nodes = material.node_tree.nodes
+    for index, texture_map in enumerate(material_3ds.maps):
+        tex_image = nodes["3DS Image %d" % index]
+        image = load_texture(texture_map.filename, prefetch)
+        if image is not None:
+            tex_image.image = image
+        else:
+            nodes.remove(nodes["3DS Mapping %d" % index])
+            nodes.remove(tex_image)
 
 
-def create_lamp(file, contextLamp, new_chunk, SCN, importedObjects):
+def create_lamp(location, SCN, importedObjects):
     """
-    Creates a new lamp and sets its location.
+    Creates a new point lamp at a location.
 
     Args:
-    contextLamp (list): Contextual information about the lamp.
-    new_chunk (Chunk3DS): The chunk containing the lamp data.
+    location (tuple): Location of the lamp.
     SCN (bpy.types.Scene): The current Blender scene.
     importedObjects (list): List of imported objects.
 
     Returns:
-    tuple: Updated contextLamp and new_chunk objects.
+    bpy.types.Object: The created lamp object.
     """
-    temp_data = file.read(localspace_variable_names.STRUCT_SIZE_3FLOAT)
-    x, y, z = struct.unpack('<3f', temp_data)
-    new_chunk.bytes_read += localspace_variable_names.STRUCT_SIZE_3FLOAT
-
     # Create a new lamp data and object, and link the object to the scene
-    lamp_data = bpy.data.lamps.new("Lamp", 'POINT')
+    lamp_data = bpy.data.lights.new("Lamp", 'POINT')
     lamp_object = bpy.data.objects.new("Lamp", lamp_data)
     SCN.collection.objects.link(lamp_object)
 
     importedObjects.append(lamp_object)
 
     # Set the lamp location
-    lamp_object.location = x, y, z
+    lamp_object.location = location
 
-    return [lamp_object, lamp_data], new_chunk
+    return lamp_object
@@ -0,0 +1,413 @@
+import fnmatch
+import os
+import zipfile
+
+import numpy as np
+
+from . import data_structure_3ds
+from . import localspace_variable_names
+from . import parse_3ds
+from . import reader_3ds
+
+from .chunk_3ds import Chunk3DS
+from .reader_3ds import Reader3DS
+from .storage_3ds import atomic_write
+
+# Bump when the layout of the index changes, older sidecars are rebuilt
+INDEX_VERSION = 2
+
+# The index of "model.3ds" is stored next to it as "model.3ds.idx"
+SIDECAR_EXTENSION = ".idx"
+
+
+class ObjectEntry3DS:
+    """
+    ObjectEntry3DS summarizes an OBJECT chunk of an indexed file.
+    """
+    __slots__ = ("name", "chunk", "vertex_count", "face_count", "bounds", "materials")
+
+    def __init__(self, name, chunk):
+        self.name = name
+        self.chunk = chunk  # position of the OBJECT chunk in the chunk table
+        self.vertex_count = 0
+        self.face_count = 0
+        self.bounds = None  # (min x, min y, min z, max x, max y, max z) of the vertices
+        # or the lamp location
+        self.materials = []  # names of the materials used by the faces
+
+
+class MaterialEntry3DS:
+    """
+    MaterialEntry3DS locates a MATERIAL chunk of an indexed file by name.
+    """
+    __slots__ = ("name", "chunk")
+
+    def __init__(self, name, chunk):
+        self.name = name
+        self.chunk = chunk  # position of the MATERIAL chunk in the chunk table
+
+
+class ChunkIndex3DS:
+    """
+    ChunkIndex3DS is a table of every chunk of a 3DS file (ID, offset, length
+    and parent) with a summary of its objects and materials, so objects can
+    be listed and located without decoding the chunks before them.
+    """
+    __slots__ = ("ids", "offsets", "lengths", "parents", "objects", "materials")
+
+    def __init__(self, ids, offsets, lengths, parents, objects, materials):
+        self.ids = ids  # uint16 chunk IDs, in file order
+        self.offsets = offsets  # uint32 offsets of the chunk headers
+        self.lengths = lengths  # uint32 chunk lengths, including the header
+        self.parents = parents  # int32 position of the parent chunk, -1 for the root
+        self.objects = objects  # list of ObjectEntry3DS
+        self.materials = materials  # list of MaterialEntry3DS
+
+    def __len__(self):
+        return len(self.ids)
+
+    def children(self, position):
+        """
+        Function to get the positions of the direct sub chunks of a chunk.
+        """
+        return np.flatnonzero(self.parents == position)
+
+    def find(self, chunk_id):
+        """
+        Function to get the positions of all chunks with the given ID.
+        """
+        return np.flatnonzero(self.ids == chunk_id)
+
+    def get_object(self, name):
+        for entry in self.objects:
+            if entry.name == name:
+                return entry
+        return None
+
+    def match_objects(self, patterns):
+        """
+        Function to get the objects whose names match any of the given names
+        or fnmatch style patterns, in file order.
+        """
+        return [
+            entry for entry in self.objects
+            if any(fnmatch.fnmatchcase(entry.name, pattern) for pattern in patterns)
+        ]
+
+    def bounds_array(self):
+        """
+        Function to get the bounds of all objects as a (objects, 6) array,
+        with NaN rows for objects without vertices.
+        """
+        bounds = [
+            entry.bounds if entry.bounds is not None else (np.nan,) * 6
+            for entry in self.objects
+        ]
+        return np.array(bounds, dtype=np.float32).reshape(-1, 6)
+
+    def bounds(self):
+        """
+        Function to get the bounds of all objects of the file, lamps included.
+
+        Returns:
+        numpy.ndarray: (2, 3) array of the min and max corners, or None if no
+        object has bounds.
+        """
+        bounds = self.bounds_array()
+        bounds = bounds[~np.isnan(bounds[:, 0])]
+        if not len(bounds):
+            return None
+        return np.array((bounds[:, :3].min(axis=0), bounds[:, 3:].max(axis=0)))
+
+    def objects_in_box(self, box_min, box_max):
+        """
+        Function to get the objects whose bounds intersect a box, in file
+        coordinates. Vertices are stored in world space, so the object
+        matrices don't need to be applied.
+        """
+        bounds = self.bounds_array()
+        hits = (
+            np.all(bounds[:, :3] <= np.asarray(box_max, dtype=np.float32), axis=1)
+            & np.all(bounds[:, 3:] >= np.asarray(box_min, dtype=np.float32), axis=1)
+        )
+        return [entry for entry, hit in zip(self.objects, hits) if hit]
+
+    def objects_in_sphere(self, center, radius):
+        """
+        Function to get the objects whose bounds intersect a sphere, in file
+        coordinates.
+        """
+        bounds = self.bounds_array()
+        center = np.asarray(center, dtype=np.float32)
+        # distance from the center to the closest point of each box
+        offset = np.clip(center, bounds[:, :3], bounds[:, 3:]) - center
+        hits = np.einsum("ij,ij->i", offset, offset) <= radius * radius
+        return [entry for entry, hit in zip(self.objects, hits) if hit]
+
+    def select_objects(self, patterns=None, box=None, sphere=None):
+        """
+        Function to get the objects matching all of the given filters.
+
+        Args:
+        patterns (list): Object names or fnmatch style patterns.
+        box (tuple): (min, max) corners of a box the objects must intersect.
+        sphere (tuple): (center, radius) of a sphere the objects must intersect.
+
+        Returns:
+        list: The matching ObjectEntry3DS, in file order.
+        """
+        objects = self.match_objects(patterns) if patterns else self.objects
+        if box is not None:
+            hits = set(self.objects_in_box(*box))
+            objects = [entry for entry in objects if entry in hits]
+        if sphere is not None:
+            hits = set(self.objects_in_sphere(*sphere))
+            objects = [entry for entry in objects if entry in hits]
+        return objects
+
+    def get_material(self, name):
+        for entry in self.materials:
+            if entry.name == name:
+                return entry
+        return None
+
+    def seek(self, file, position):
+        """
+        Function to move a file to a chunk of the table and read its header.
+
+        Args:
+        file (Reader3DS): The indexed file.
+        position (int): Position of the chunk in the table.
+
+        Returns:
+        Chunk3DS: The chunk, positioned right after its header.
+        """
+        chunk = Chunk3DS()
+        file.seek(int(self.offsets[position]))
+        reader_3ds.read_chunk(file, chunk)
+        return chunk
+
+    def save(self, path, key):
+        """
+        Function to write the index to a sidecar file, tagged with the key
+        of the indexed file.
+        """
+        object_materials = [name for entry in self.objects for name in entry.materials]
+        arrays = {
+            "key": np.array((INDEX_VERSION,) + key, dtype=np.int64),
+            "ids": self.ids,
+            "offsets": self.offsets,
+            "lengths": self.lengths,
+            "parents": self.parents,
+            "object_names": np.array([entry.name for entry in self.objects], dtype=np.str_),
+            "object_chunks": np.array([entry.chunk for entry in self.objects], dtype=np.int32),
+            "vertex_counts": np.array(
+                [entry.vertex_count for entry in self.objects], dtype=np.int32),
+            "face_counts": np.array([entry.face_count for entry in self.objects], dtype=np.int32),
+            "bounds": self.bounds_array(),
+            "material_counts": np.array(
+                [len(entry.materials) for entry in self.objects], dtype=np.int32),
+            "object_materials": np.array(object_materials, dtype=np.str_),
+            "material_names": np.array([entry.name for entry in self.materials], dtype=np.str_),
+            "material_chunks": np.array([entry.chunk for entry in self.materials], dtype=np.int32),
+        }
+
+        with atomic_write(path) as file:
+            np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, path, key):
+        """
+        Function to read an index from a sidecar file.
+
+        Returns:
+        ChunkIndex3DS: The index, or None if it was made for another version
+        of the file or of the index layout.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            if tuple(data["key"]) != (INDEX_VERSION,) + key:
+                return None
+
+            objects = []
+            material_names = iter(data["object_materials"].tolist())
+            for name, chunk, vertex_count, face_count, bounds, material_count in zip(
+                    data["object_names"].tolist(), data["object_chunks"].tolist(),
+                    data["vertex_counts"].tolist(), data["face_counts"].tolist(),
+                    data["bounds"].tolist(), data["material_counts"].tolist()):
+                entry = ObjectEntry3DS(name, chunk)
+                entry.vertex_count = vertex_count
+                entry.face_count = face_count
+                entry.bounds = None if np.isnan(bounds[0]) else tuple(bounds)
+                entry.materials = [next(material_names) for _ in range(material_count)]
+                objects.append(entry)
+
+            materials = [
+                MaterialEntry3DS(name, chunk) for name, chunk in
+                zip(data["material_names"].tolist(), data["material_chunks"].tolist())
+            ]
+
+            return cls(data["ids"], data["offsets"], data["lengths"], data["parents"],
+                       objects, materials)
+
+
+class IndexState:
+    """
+    IndexState holds the tables filled while a file is indexed.
+    """
+    __slots__ = ("ids", "offsets", "lengths", "parents", "open", "objects", "materials")
+
+    def __init__(self):
+        self.ids = []
+        self.offsets = []
+        self.lengths = []
+        self.parents = []
+        self.open = []  # positions of the container chunks being walked
+        self.objects = []
+        self.materials = []
+
+
+def index_object(file, chunk, state):
+    name, read_str_len = reader_3ds.read_string(file)
+    state.objects.append(ObjectEntry3DS(name, len(state.ids) - 1))
+
+
+def index_material(file, chunk, state):
+    state.materials.append(MaterialEntry3DS("Material", len(state.ids) - 1))
+
+
+def index_material_name(file, chunk, state):
+    state.materials[-1].name = reader_3ds.read_string(file)[0].rstrip()
+
+
+def index_vertices(file, chunk, state):
+    entry = state.objects[-1]
+    vertices = reader_3ds.read_vertices(file, chunk)
+    entry.vertex_count = len(vertices)
+    if len(vertices):
+        entry.bounds = tuple(vertices.min(axis=0).tolist() + vertices.max(axis=0).tolist())
+
+
+def index_faces(file, chunk, state):
+    entry = state.objects[-1]
+    entry.face_count = reader_3ds.read_short(file, chunk)
+    # the sub chunks follow the face list
+    file.skip(entry.face_count * localspace_variable_names.STRUCT_SIZE_4UNSIGNED_SHORT)
+
+
+def index_face_material(file, chunk, state):
+    state.objects[-1].materials.append(reader_3ds.read_string(file)[0])
+
+
+def index_lamp(file, chunk, state):
+    location = file.unpack(localspace_variable_names.STRUCT_3FLOAT)
+    state.objects[-1].bounds = location + location
+
+
+INDEX_HANDLERS = {
+    data_structure_3ds.OBJECT: index_object,
+    data_structure_3ds.MATERIAL: index_material,
+    data_structure_3ds.MAT_NAME: index_material_name,
+    data_structure_3ds.OBJECT_VERTICES: index_vertices,
+    data_structure_3ds.OBJECT_FACES: index_faces,
+    data_structure_3ds.OBJECT_MATERIAL: index_face_material,
+    data_structure_3ds.OBJECT_LAMP: index_lamp,
+}
+
+
+def index_chunk(file, chunk, state):
+    """
+    Records every chunk in the chunk table, then decodes the few chunks the
+    summaries need.
+    """
+    position = len(state.ids)
+    state.ids.append(chunk.ID)
+    state.offsets.append(file.tell() - chunk.bytes_read)
+    state.lengths.append(chunk.length)
+    state.parents.append(state.open[-1])
+
+    handler = INDEX_HANDLERS.get(chunk.ID)
+    if handler is not None:
+        handler(file, chunk, state)
+
+    if chunk.ID in data_structure_3ds.CONTAINER_CHUNKS:
+        state.open.append(position)
+
+
+def index_container_end(state):
+    state.open.pop()
+
+
+def build_chunk_index(file):
+    """
+    Walks every chunk header of a file to build its chunk index. Only the
+    object and material names, the vertices (for the bounds) and the face
+    counts are decoded, everything else is skipped by offset.
+
+    Args:
+    file (Reader3DS): File to index.
+
+    Returns:
+    ChunkIndex3DS: The index, or None if the file isn't a 3DS file.
+    """
+    chunk = Chunk3DS()
+    file.seek(0)
+    if len(file) < localspace_variable_names.STRUCT_CHUNK_HEADER.size:
+        return None
+    reader_3ds.read_chunk(file, chunk)
+    if chunk.ID != data_structure_3ds.PRIMARY:
+        return None
+
+    state = IndexState()
+    state.open.append(-1)
+    index_chunk(file, chunk, state)
+    end_handlers = dict.fromkeys(data_structure_3ds.CONTAINER_CHUNKS, index_container_end)
+    parse_3ds.walk_chunks(
+        file, chunk.ID, chunk.length, state, {}, end_handlers, default_handler=index_chunk
+    )
+
+    return ChunkIndex3DS(
+        np.array(state.ids, dtype=np.uint16),
+        np.array(state.offsets, dtype=np.uint32),
+        np.array(state.lengths, dtype=np.uint32),
+        np.array(state.parents, dtype=np.int32),
+        state.objects,
+        state.materials,
+    )
+
+
+def get_chunk_index(filepath, use_sidecar=True):
+    """
+    Returns the chunk index of a file, read from its sidecar file when that
+    was made for the current size and modification time of the file, and
+    built (and saved to the sidecar) otherwise.
+
+    Args:
+    filepath (str): Path of the 3DS file.
+    use_sidecar (bool): Whether the sidecar file is read and written.
+
+    Returns:
+    ChunkIndex3DS: The index, or None if the file isn't a 3DS file.
+    """
+    stat = os.stat(filepath)
+    key = (stat.st_size, stat.st_mtime_ns)
+    sidecar = filepath + SIDECAR_EXTENSION
+
+    if use_sidecar:
+        try:
+            index = ChunkIndex3DS.load(sidecar, key)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # An empty or damaged sidecar is a miss, it is rebuilt and overwritten
+            index = None
+        if index is not None:
+            return index
+
+    with Reader3DS(filepath) as file:
+        index = build_chunk_index(file)
+
+    if index is not None and use_sidecar:
+        try:
+            index.save(sidecar, key)
+        except OSError:
+            # Read-only directories are indexed every time
+            pass
+    return index
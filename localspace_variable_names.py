@@ -1,10 +1,20 @@
 import struct
 
-STRUCT_SIZE_FLOAT = struct.calcsize('f')
+# Precompiled layouts of the fixed size chunk data, read with unpack_from
+STRUCT_CHUNK_HEADER = struct.Struct('<HI')  # chunk ID, chunk length
+STRUCT_UNSIGNED_SHORT = struct.Struct('<H')
+STRUCT_3UNSIGNED_SHORT = struct.Struct('<3H')
+STRUCT_UNSIGNED_INT = struct.Struct('<I')
+STRUCT_FLOAT = struct.Struct('<f')
+STRUCT_3FLOAT = struct.Struct('<3f')
+STRUCT_3BYTE = struct.Struct('<3B')
+STRUCT_4x3MAT = struct.Struct('<12f')
+
+STRUCT_SIZE_FLOAT = STRUCT_FLOAT.size
 STRUCT_SIZE_2FLOAT = struct.calcsize('2f')
-STRUCT_SIZE_3FLOAT = struct.calcsize('3f')
+STRUCT_SIZE_3FLOAT = STRUCT_3FLOAT.size
 STRUCT_SIZE_4FLOAT = struct.calcsize('4f')
-STRUCT_SIZE_UNSIGNED_SHORT = struct.calcsize('H')
+STRUCT_SIZE_UNSIGNED_SHORT = STRUCT_UNSIGNED_SHORT.size
+STRUCT_SIZE_3UNSIGNED_SHORT = STRUCT_3UNSIGNED_SHORT.size
 STRUCT_SIZE_4UNSIGNED_SHORT = struct.calcsize('4H')
-STRUCT_SIZE_4x3MAT = struct.calcsize('ffffffffffff')
-# STRUCT_SIZE_4x3MAT = calcsize('ffffffffffff')
+STRUCT_SIZE_4x3MAT = STRUCT_4x3MAT.size
@@ -0,0 +1,223 @@
+import bpy
+from bpy.props import BoolProperty, FloatProperty, FloatVectorProperty, EnumProperty, StringProperty
+from bpy_extras.io_utils import ImportHelper, ExportHelper, axis_conversion
+
+from . import EXT_3DS, FILTER_GLOB
+
+
+class Import3DSProperties:
+    constrain_size: FloatProperty(
+        name="Size Constraint",
+        description="Scale the model by 10 until it reaches the size constraint (0 to disable)",
+        min=0.0, max=1000.0,
+        soft_min=0.0, soft_max=1000.0,
+        default=10.0,
+    )
+
+    use_image_search: BoolProperty(
+        name="Image Search",
+        description="Search subdirectories for any associated images (Warning, may be slow)",
+        default=True,
+    )
+
+    use_apply_transform: BoolProperty(
+        name="Apply Transform",
+        description="Workaround for object transformations importing incorrectly",
+        default=True,
+    )
+
+    object_names: StringProperty(
+        name="Objects",
+        description="Only import the objects matching these comma separated names "
+                    "or wildcard patterns, with their materials (empty imports all)",
+        default="",
+    )
+
+    region: EnumProperty(
+        name="Region",
+        description="Only import the objects whose bounds intersect a region of the file",
+        items=(('NONE', "Everything", "Import objects anywhere in the file"),
+               ('BOX', "Box", "Import objects intersecting the box between Region Min and Max"),
+               ('SPHERE', "Sphere", "Import objects intersecting the sphere at Region Center")),
+        default='NONE',
+    )
+
+    region_min: FloatVectorProperty(
+        name="Region Min",
+        description="Lowest corner of the region box, in file coordinates",
+        default=(-1.0, -1.0, -1.0),
+    )
+
+    region_max: FloatVectorProperty(
+        name="Region Max",
+        description="Highest corner of the region box, in file coordinates",
+        default=(1.0, 1.0, 1.0),
+    )
+
+    region_center: FloatVectorProperty(
+        name="Region Center",
+        description="Center of the region sphere, in file coordinates",
+        default=(0.0, 0.0, 0.0),
+    )
+
+    region_radius: FloatProperty(
+        name="Region Radius",
+        description="Radius of the region sphere",
+        min=0.0,
+        default=1.0,
+    )
+
+    use_proxies: BoolProperty(
+        name="Bounding Box Proxies",
+        description="Import a box per object instead of its mesh, "
+                    "use Load 3DS Proxies to load the meshes of selected boxes later",
+        default=False,
+    )
+
+    use_cache: BoolProperty(
+        name="Parse Cache",
+        description="Keep the decoded geometry of imported files on disk "
+                    "and reuse it when the same file is imported again",
+        default=False,
+    )
+
+
+class Export3DSProperties:
+    use_selection: BoolProperty(
+        name="Selection Only",
+        description="Export selected objects only",
+        default=False,
+    )
+
+
+class OrientationProperties:
+    axis_forward: EnumProperty(
+        name="Forward",
+        items=(('X', "X Forward", ""),
+               ('Y', "Y Forward", ""),
+               ('Z', "Z Forward", ""),
+               ('-X', "-X Forward", ""),
+               ('-Y', "-Y Forward", ""),
+               ('-Z', "-Z Forward", "")),
+        default='Y',
+    )
+
+    axis_up: EnumProperty(
+        name="Up",
+        items=(('X', "X Up", ""),
+               ('Y', "Y Up", ""),
+               ('Z', "Z Up", ""),
+               ('-X', "-X Up", ""),
+               ('-Y', "-Y Up", ""),
+               ('-Z', "-Z Up", "")),
+        default='Z',
+    )
+
+
+class Import3DS(bpy.types.Operator, ImportHelper, Import3DSProperties, OrientationProperties):
+    bl_idname = "import_scene.autodesk_3ds"
+    bl_label = 'Import'
+    bl_options = {'UNDO'}
+
+    filename_ext = EXT_3DS
+    filter_glob = StringProperty(
+        default=FILTER_GLOB,
+        options={'HIDDEN'},
+    )
+
+    def execute(self, context):
+        from . import import_3ds
+
+        keywords = self.as_keywords(
+            ignore=("axis_forward", "axis_up", "filter_glob"))
+
+        keywords["global_matrix"] = axis_conversion(
+            from_forward=self.axis_forward, from_up=self.axis_up).to_4x4()
+
+        return import_3ds.load(self, context, **keywords)
+
+
+class Load3DSProxies(bpy.types.Operator):
+    """Replace the selected 3DS proxies with their meshes"""
+    bl_idname = "object.autodesk_3ds_load_proxies"
+    bl_label = 'Load 3DS Proxies'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    use_image_search: BoolProperty(
+        name="Image Search",
+        description="Search subdirectories for any associated images (Warning, may be slow)",
+        default=True,
+    )
+
+    use_apply_transform: BoolProperty(
+        name="Apply Transform",
+        description="Workaround for object transformations importing incorrectly",
+        default=True,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        from .helper_functions import PROXY_OFFSET
+        return any(PROXY_OFFSET in ob for ob in context.selected_objects)
+
+    def execute(self, context):
+        from . import import_3ds
+
+        import_3ds.load_proxies(
+            context, list(context.selected_objects),
+            IMAGE_SEARCH=self.use_image_search, APPLY_MATRIX=self.use_apply_transform)
+
+        return {'FINISHED'}
+
+
+class Export3DS(bpy.types.Operator, ExportHelper, Export3DSProperties, OrientationProperties):
+    bl_idname = "export_scene.autodesk_3ds"
+    bl_label = 'Export'
+
+    filename_ext = EXT_3DS
+    filter_glob = StringProperty(
+        default=FILTER_GLOB,
+        options={'HIDDEN'},
+    )
+
+    def execute(self, context):
+        from . import export_3ds
+
+        keywords = self.as_keywords(
+            ignore=("axis_forward", "axis_up", "filter_glob", "check_existing"))
+
+        keywords["global_matrix"] = axis_conversion(
+            to_forward=self.axis_forward, to_up=self.axis_up).to_4x4()
+
+        return export_3ds.save(self, context, **keywords)
+
+
+def menu_func_export(self, context):
+    self.layout.operator(Export3DS.bl_idname, text="3D Studio (.3ds) BROKEN")
+
+
+def menu_func_import(self, context):
+    self.layout.operator(
+        Import3DS.bl_idname, text="3D Studio (.3ds) IN DEVELOPMENT")
+
+
+def menu_func_load_proxies(self, context):
+    self.layout.operator(Load3DSProxies.bl_idname)
+
+
+def register():
+    bpy.utils.register_class(Import3DS)
+    bpy.utils.register_class(Load3DSProxies)
+    bpy.utils.register_class(Export3DS)
+    bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
+    bpy.types.TOPBAR_MT_file_export.append(menu_func_export)
+    bpy.types.VIEW3D_MT_object.append(menu_func_load_proxies)
+
+
+def unregister():
+    bpy.utils.unregister_class(Import3DS)
+    bpy.utils.unregister_class(Load3DSProxies)
+    bpy.utils.unregister_class(Export3DS)
+    bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+    bpy.types.TOPBAR_MT_file_export.remove(menu_func_export)
+    bpy.types.VIEW3D_MT_object.remove(menu_func_load_proxies)
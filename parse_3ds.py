@@ -0,0 +1,404 @@
+from . import data_structure_3ds
+from . import localspace_variable_names
+from . import reader_3ds
+
+from .chunk_3ds import Chunk3DS
+from .scene_3ds import (
+    Lamp3DS,
+    Material3DS,
+    Mesh3DS,
+    Node3DS,
+    Scene3DS,
+    TextureMap3DS,
+)
+
+# Layouts of the MAT_TRANSPARENCY percentage chunks
+PERCENTAGE_FORMATS = {
+    data_structure_3ds.PERCENTAGE_SHORT: localspace_variable_names.STRUCT_UNSIGNED_SHORT,
+    data_structure_3ds.PERCENTAGE_FLOAT: localspace_variable_names.STRUCT_FLOAT,
+}
+
+
+class ParseState:
+    """
+    ParseState holds the scene being filled and the blocks the chunk walker
+    is currently inside of.
+    """
+    __slots__ = ("scene", "prefetch", "object_name", "material", "texture_map", "mesh", "node")
+
+    def __init__(self, scene, prefetch=None):
+        self.scene = scene
+        self.prefetch = prefetch
+        self.object_name = None
+        self.material = None  # Material3DS of the current MATERIAL block
+        self.texture_map = None  # TextureMap3DS of the current MAT_*_MAP block
+        self.mesh = None  # Mesh3DS of the current OBJECT_MESH block
+        self.node = None  # Node3DS of the current keyframe node
+
+
+def read_color_chunk(file, chunk):
+    """
+    Reads the color sub chunk of a MAT_AMBIENT, MAT_DIFFUSE or MAT_SPECULAR chunk.
+
+    Returns:
+    list: Three floats, or None if the sub chunk isn't a color.
+    """
+    temp_chunk = Chunk3DS()
+    reader_3ds.read_chunk(file, temp_chunk)
+    chunk.bytes_read += temp_chunk.bytes_read
+
+    if temp_chunk.ID == data_structure_3ds.MAT_FLOAT_COLOR:
+        return reader_3ds.read_float_color(file, temp_chunk)
+    if temp_chunk.ID == data_structure_3ds.MAT_24BIT_COLOR:
+        return reader_3ds.read_byte_color(file, temp_chunk)
+    return None
+
+
+def handle_version(file, chunk, state):
+    state.scene.version = reader_3ds.read_int(file, chunk)
+    if state.scene.version > 3:
+        print(
+            "\tNon-Fatal Error: Version greater than 3, may not load correctly:",
+            state.scene.version,
+        )
+
+
+def handle_object(file, chunk, state):
+    state.mesh = None
+    state.object_name, read_str_len = reader_3ds.read_string(file)
+    chunk.bytes_read += read_str_len
+
+
+def handle_material(file, chunk, state):
+    state.material = Material3DS()
+    state.scene.materials.append(state.material)
+
+
+def handle_material_name(file, chunk, state):
+    material_name, read_str_len = reader_3ds.read_string(file)
+    state.material.name = material_name.rstrip()
+    chunk.bytes_read += read_str_len
+
+
+def handle_ambient(file, chunk, state):
+    color = read_color_chunk(file, chunk)
+    if color is not None:
+        state.material.ambient = color
+
+
+def handle_diffuse(file, chunk, state):
+    color = read_color_chunk(file, chunk)
+    if color is not None:
+        state.material.diffuse = color
+
+
+def handle_specular(file, chunk, state):
+    color = read_color_chunk(file, chunk)
+    if color is not None:
+        state.material.specular = color
+
+
+def handle_transparency(file, chunk, state):
+    temp_chunk = Chunk3DS()
+    reader_3ds.read_chunk(file, temp_chunk)
+
+    alpha_value = 1.0
+    if temp_chunk.ID in PERCENTAGE_FORMATS:
+        percentage = file.unpack(PERCENTAGE_FORMATS[temp_chunk.ID])[0]
+        alpha_value = 1 - (float(percentage) / 100)
+    else:
+        print("Cannot read material transparency")
+
+    state.material.alpha = alpha_value
+
+
+def handle_texture_map(file, chunk, state):
+    state.texture_map = TextureMap3DS(data_structure_3ds.TEXTURE_MAPTO[chunk.ID], None)
+
+
+def finish_texture_map(state):
+    # add the map to the material in the right channel
+    if state.texture_map.filename:
+        state.material.maps.append(state.texture_map)
+    state.texture_map = None
+
+
+def handle_map_filepath(file, chunk, state):
+    texture_name, read_str_len = reader_3ds.read_string(file)
+    chunk.bytes_read += read_str_len
+
+    if state.texture_map is not None:
+        state.texture_map.filename = texture_name
+    elif not state.material.maps:
+        state.material.maps.append(TextureMap3DS("COLOR", texture_name))
+    else:
+        return
+
+    if state.prefetch is not None:
+        state.prefetch.submit(texture_name)
+
+
+def handle_map_uscale(file, chunk, state):
+    state.texture_map.scale = (reader_3ds.read_float(file, chunk), state.texture_map.scale[1])
+
+
+def handle_map_vscale(file, chunk, state):
+    state.texture_map.scale = (state.texture_map.scale[0], reader_3ds.read_float(file, chunk))
+
+
+def handle_map_uoffset(file, chunk, state):
+    state.texture_map.offset = (reader_3ds.read_float(file, chunk), state.texture_map.offset[1])
+
+
+def handle_map_voffset(file, chunk, state):
+    state.texture_map.offset = (state.texture_map.offset[0], reader_3ds.read_float(file, chunk))
+
+
+def handle_map_tiling(file, chunk, state):
+    tiling = reader_3ds.read_short(file, chunk)
+    if tiling & 0x2:
+        state.texture_map.extension = "mirror"
+    elif tiling & 0x10:
+        state.texture_map.extension = "decal"
+
+
+def handle_map_angle(file, chunk, state):
+    print("\nwarning: ignoring UV rotation")
+
+
+def handle_lamp(file, chunk, state):  # Basic lamp support.
+    location = file.unpack(localspace_variable_names.STRUCT_3FLOAT)
+    chunk.bytes_read += localspace_variable_names.STRUCT_SIZE_3FLOAT
+
+    state.scene.lamps.append(Lamp3DS(state.object_name, location))
+
+
+def handle_mesh(file, chunk, state):
+    state.mesh = Mesh3DS(state.object_name)
+    state.scene.meshes.append(state.mesh)
+
+
+def handle_vertices(file, chunk, state):
+    # Worldspace vertex locations
+    state.mesh.vertices = reader_3ds.read_vertices(file, chunk)
+
+
+def handle_faces(file, chunk, state):
+    state.mesh.faces = reader_3ds.read_faces(file, chunk)
+
+
+def handle_face_material(file, chunk, state):
+    material_name, read_str_len = reader_3ds.read_string(file)
+    chunk.bytes_read += read_str_len  # remove 1 null character.
+
+    face_indices = reader_3ds.read_face_indices(file, chunk)
+    state.mesh.materials.append((material_name, face_indices))
+
+
+def handle_uvs(file, chunk, state):
+    state.mesh.uvs = reader_3ds.read_uvs(file, chunk)
+
+
+def handle_matrix(file, chunk, state):
+    # How do we know the matrix size? 54 == 4x4 48 == 4x3
+    state.mesh.matrix = file.unpack(localspace_variable_names.STRUCT_4x3MAT)
+    chunk.bytes_read += localspace_variable_names.STRUCT_SIZE_4x3MAT
+
+
+def handle_node(file, chunk, state):
+    state.node = Node3DS(chunk.ID)
+    state.scene.nodes.append(state.node)
+
+
+def handle_node_header(file, chunk, state):
+    state.node.name, read_str_len = reader_3ds.read_string(file)
+    chunk.bytes_read += read_str_len
+
+    header = file.unpack(localspace_variable_names.STRUCT_3UNSIGNED_SHORT)
+    state.node.parent = header[2]  # flags, flags, parent index
+    chunk.bytes_read += localspace_variable_names.STRUCT_SIZE_3UNSIGNED_SHORT
+
+
+def handle_instance_name(file, chunk, state):
+    state.node.instance_name, read_str_len = reader_3ds.read_string(file)
+    chunk.bytes_read += read_str_len
+
+
+def handle_pivot(file, chunk, state):
+    state.node.pivot = file.unpack(localspace_variable_names.STRUCT_3FLOAT)
+    chunk.bytes_read += localspace_variable_names.STRUCT_SIZE_3FLOAT
+
+
+# Handlers called with (file, chunk, state) right after a chunk header is read.
+# Chunks without a handler are skipped, unless they are container chunks.
+CHUNK_HANDLERS = {
+    data_structure_3ds.VERSION: handle_version,
+    data_structure_3ds.OBJECT: handle_object,
+    data_structure_3ds.MATERIAL: handle_material,
+    data_structure_3ds.MAT_NAME: handle_material_name,
+    data_structure_3ds.MAT_AMBIENT: handle_ambient,
+    data_structure_3ds.MAT_DIFFUSE: handle_diffuse,
+    data_structure_3ds.MAT_SPECULAR: handle_specular,
+    data_structure_3ds.MAT_TRANSPARENCY: handle_transparency,
+    data_structure_3ds.MAT_MAP_FILEPATH: handle_map_filepath,
+    data_structure_3ds.MAT_MAP_USCALE: handle_map_uscale,
+    data_structure_3ds.MAT_MAP_VSCALE: handle_map_vscale,
+    data_structure_3ds.MAT_MAP_UOFFSET: handle_map_uoffset,
+    data_structure_3ds.MAT_MAP_VOFFSET: handle_map_voffset,
+    data_structure_3ds.MAT_MAP_TILING: handle_map_tiling,
+    data_structure_3ds.MAT_MAP_ANG: handle_map_angle,
+    data_structure_3ds.OBJECT_LAMP: handle_lamp,
+    data_structure_3ds.OBJECT_MESH: handle_mesh,
+    data_structure_3ds.OBJECT_VERTICES: handle_vertices,
+    data_structure_3ds.OBJECT_FACES: handle_faces,
+    data_structure_3ds.OBJECT_MATERIAL: handle_face_material,
+    data_structure_3ds.OBJECT_UV: handle_uvs,
+    data_structure_3ds.OBJECT_TRANS_MATRIX: handle_matrix,
+    data_structure_3ds.ED_KEY_AMBIENT_NODE: handle_node,
+    data_structure_3ds.ED_KEY_OBJECT_NODE: handle_node,
+    data_structure_3ds.ED_KEY_CAMERA_NODE: handle_node,
+    data_structure_3ds.ED_KEY_TARGET_NODE: handle_node,
+    data_structure_3ds.ED_KEY_LIGHT_NODE: handle_node,
+    data_structure_3ds.ED_KEY_L_TARGET_NODE: handle_node,
+    data_structure_3ds.ED_KEY_SPOTLIGHT_NODE: handle_node,
+    data_structure_3ds.EK_OB_NODE_HEADER: handle_node_header,
+    data_structure_3ds.EK_OB_INSTANCE_NAME: handle_instance_name,
+    data_structure_3ds.EK_OB_PIVOT: handle_pivot,
+}
+CHUNK_HANDLERS.update(dict.fromkeys(data_structure_3ds.TEXTURE_MAPTO, handle_texture_map))
+
+# Handlers called with (state) once all sub chunks of a container chunk are read
+CHUNK_END_HANDLERS = dict.fromkeys(data_structure_3ds.TEXTURE_MAPTO, finish_texture_map)
+
+
+def walk_chunks(
+    file,
+    root_id,
+    root_end,
+    state,
+    handlers=CHUNK_HANDLERS,
+    end_handlers=CHUNK_END_HANDLERS,
+    default_handler=None,
+):
+    """
+    Walks the sub chunks of a container chunk, dispatching each chunk to its
+    handler. Nested chunks are tracked on an explicit stack of end offsets
+    instead of recursion.
+
+    Args:
+    file (Reader3DS): File positioned at the first sub chunk.
+    root_id (int): ID of the container chunk.
+    root_end (int): Offset of the end of the container chunk.
+    state (ParseState): State the handlers fill.
+    handlers (dict): Chunk ID: handler called after the chunk header is read.
+    end_handlers (dict): Chunk ID: handler called after the last sub chunk.
+    default_handler (function): Handler of the chunks missing from handlers.
+    """
+    containers = data_structure_3ds.CONTAINER_CHUNKS
+    header_size = localspace_variable_names.STRUCT_CHUNK_HEADER.size
+
+    stack = [(root_id, min(root_end, len(file)))]
+    chunk = Chunk3DS()
+    while stack:
+        chunk_id, end = stack[-1]
+        start = file.tell()
+        if start + header_size > end:
+            stack.pop()
+            file.seek(end)
+            end_handler = end_handlers.get(chunk_id)
+            if end_handler is not None:
+                end_handler(state)
+            continue
+
+        reader_3ds.read_chunk(file, chunk)
+        # a chunk can't end before its header or after its parent
+        chunk_end = min(start + max(chunk.length, header_size), end)
+
+        handler = handlers.get(chunk.ID, default_handler)
+        if handler is not None:
+            handler(file, chunk, state)
+
+        if chunk.ID in containers:
+            # the sub chunks follow the data read by the handler
+            stack.append((chunk.ID, chunk_end))
+        else:
+            file.seek(chunk_end)
+
+
+def parse_chunk(file, chunk, state):
+    """
+    Decodes a chunk whose header was just read, including its sub chunks.
+
+    Args:
+    file (Reader3DS): File positioned right after the header of chunk.
+    chunk (Chunk3DS): The chunk to decode.
+    state (ParseState): State the handlers fill.
+    """
+    end = file.tell() - localspace_variable_names.STRUCT_CHUNK_HEADER.size + chunk.length
+
+    handler = CHUNK_HANDLERS.get(chunk.ID)
+    if handler is not None:
+        handler(file, chunk, state)
+
+    if chunk.ID in data_structure_3ds.CONTAINER_CHUNKS:
+        walk_chunks(file, chunk.ID, end, state)
+    else:
+        file.seek(end)
+
+
+def parse_3ds(file, texturePrefetch=None):
+    """
+    Parses a 3DS file into a Scene3DS, without any Blender dependency.
+
+    Geometry arrays are views of the file buffer and stay valid after the
+    reader is closed.
+
+    Args:
+    file (Reader3DS): File to parse.
+    texturePrefetch (TexturePrefetch): Optional prefetcher to queue texture files on.
+
+    Returns:
+    Scene3DS: The parsed scene, or None if the file isn't a 3DS file.
+    """
+    current_chunk = Chunk3DS()
+    file.seek(0)
+    reader_3ds.read_chunk(file, current_chunk)
+    if current_chunk.ID != data_structure_3ds.PRIMARY:
+        return None
+
+    scene = Scene3DS()
+    root_end = file.tell() - current_chunk.bytes_read + current_chunk.length
+    walk_chunks(file, current_chunk.ID, root_end, ParseState(scene, texturePrefetch))
+    return scene
+
+
+def parse_3ds_objects(file, index, objects, texturePrefetch=None):
+    """
+    Parses only the given objects, with the materials they use. The chunks
+    are located with the chunk index of the file, everything else is never
+    read.
+
+    Args:
+    file (Reader3DS): File to parse.
+    index (ChunkIndex3DS): Chunk index of the file.
+    objects (list): ObjectEntry3DS of the index to parse.
+    texturePrefetch (TexturePrefetch): Optional prefetcher to queue texture files on.
+
+    Returns:
+    Scene3DS: The parsed scene.
+    """
+    scene = Scene3DS()
+    state = ParseState(scene, texturePrefetch)
+
+    for position in index.find(data_structure_3ds.VERSION):
+        parse_chunk(file, index.seek(file, position), state)
+
+    material_names = {name.rstrip() for entry in objects for name in entry.materials}
+    for entry in index.materials:
+        if entry.name in material_names:
+            parse_chunk(file, index.seek(file, entry.chunk), state)
+
+    for entry in objects:
+        parse_chunk(file, index.seek(file, entry.chunk), state)
+
+    return scene
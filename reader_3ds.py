@@ -0,0 +1,292 @@
+import mmap
+
+import numpy as np
+
+from . import localspace_variable_names
+
+
+class Reader3DS:
+    """
+    Reader3DS is a read-only view of a 3DS file backed by a memory map.
+
+    Chunks are walked by offset: reads return memoryview slices of the mapped
+    buffer instead of new bytes objects, and skipping a chunk only advances the
+    offset. The class mimics the subset of the file API used by the importer
+    (read, seek, tell, close and name).
+    """
+    __slots__ = ("name", "offset", "buffer", "_file", "_map")
+
+    def __init__(self, filepath):
+        self.name = filepath
+        self.offset = 0
+        self._file = open(filepath, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self._map = b""
+        self.buffer = memoryview(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._map)
+
+    def read(self, size):
+        """
+        Returns a zero-copy view of the next size bytes and advances past them.
+        """
+        start = self.offset
+        self.offset = min(start + size, len(self._map))
+        return self.buffer[start:self.offset]
+
+    def skip(self, size):
+        """
+        Advances the offset by size bytes without touching the data.
+        """
+        self.offset = min(self.offset + size, len(self._map))
+
+    def read_string(self):
+        """
+        Reads a null-terminated string at the current offset.
+
+        Returns:
+        tuple: A tuple (string, length), where 'length' includes the null character.
+        """
+        end = self._map.find(b'\x00', self.offset)
+        if end == -1:
+            end = len(self._map)
+        value = str(self.buffer[self.offset:end], "utf-8", "replace")
+        length = end - self.offset + 1
+        self.skip(length)
+        return value, length
+
+    def unpack(self, layout):
+        """
+        Decodes a fixed size value at the current offset and advances past it.
+
+        Args:
+        layout (struct.Struct): Precompiled layout of the value.
+
+        Returns:
+        tuple: The unpacked fields.
+        """
+        values = layout.unpack_from(self.buffer, self.offset)
+        self.offset += layout.size
+        return values
+
+    def seek(self, offset):
+        self.offset = offset
+
+    def tell(self):
+        return self.offset
+
+    def close(self):
+        self.buffer.release()
+        if isinstance(self._map, mmap.mmap):
+            try:
+                self._map.close()
+            except BufferError:
+                # Views handed out by read() are still alive, the map is
+                # unmapped once the last of them is garbage collected.
+                pass
+        self._file.close()
+
+
+def read_chunk(file, chunk):
+    """
+    Reads a chunk of data from the given file.
+
+    Args:
+    file (Reader3DS): File to read data from.
+    chunk (Chunk): Chunk object that holds the ID, length, and bytes read of the data chunk.
+
+    Returns: None
+    """
+    header = localspace_variable_names.STRUCT_CHUNK_HEADER
+    chunk.ID, chunk.length = file.unpack(header)
+    chunk.bytes_read = header.size  # update the bytes read function
+
+
+def read_string(file):
+    """
+    Reads a null-terminated string from a file.
+
+    Args:
+    file (Reader3DS): File to read the string from.
+
+    Returns:
+    tuple: A tuple (string, length), where 'string' is the read string and 'length' is the length of the string plus one for the null character.
+    """
+    return file.read_string()
+
+
+def read_float_color(file, temp_chunk):
+    """
+    Reads a three float color value from a file.
+
+    Args:
+    file (Reader3DS): File to read the float color from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    list: A list of three floats representing the color.
+    """
+    temp_chunk.bytes_read += localspace_variable_names.STRUCT_SIZE_3FLOAT
+    return list(file.unpack(localspace_variable_names.STRUCT_3FLOAT))
+
+
+def skip_to_end(file, skip_chunk):
+    """
+    Skips to the end of a chunk in a file without reading the skipped bytes.
+
+    Args:
+    file (Reader3DS): File to skip through.
+    skip_chunk (Chunk3DS): The chunk to skip.
+    """
+    buffer_size = skip_chunk.length - skip_chunk.bytes_read
+    file.skip(buffer_size)
+    skip_chunk.bytes_read += buffer_size
+
+
+def read_float(file, temp_chunk):
+    """
+    Reads a float from a file.
+
+    Args:
+    file (Reader3DS): File to read the float from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    float: The float read from the file.
+    """
+    temp_chunk.bytes_read += localspace_variable_names.STRUCT_SIZE_FLOAT
+    return file.unpack(localspace_variable_names.STRUCT_FLOAT)[0]
+
+
+def read_short(file, temp_chunk):
+    """
+    Reads an unsigned short from a file.
+
+    Args:
+    file (Reader3DS): File to read the short from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    int: The unsigned short read from the file.
+    """
+    temp_chunk.bytes_read += localspace_variable_names.STRUCT_SIZE_UNSIGNED_SHORT
+    return file.unpack(localspace_variable_names.STRUCT_UNSIGNED_SHORT)[0]
+
+
+def read_array(file, temp_chunk, dtype, columns):
+    """
+    Reads a count-prefixed array from a file without copying it.
+
+    Args:
+    file (Reader3DS): File to read the array from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+    dtype (str): Little-endian numpy type of a single element.
+    columns (int): Number of elements per item.
+
+    Returns:
+    numpy.ndarray: A read-only (count, columns) view of the file data.
+    """
+    count = read_short(file, temp_chunk)
+    dtype = np.dtype(dtype)
+    data_size = dtype.itemsize * columns * count
+    temp_data = file.read(data_size)
+    temp_chunk.bytes_read += data_size
+    return np.frombuffer(temp_data, dtype=dtype).reshape(count, columns)
+
+
+def read_vertices(file, temp_chunk):
+    """
+    Reads the payload of an OBJECT_VERTICES chunk.
+
+    Args:
+    file (Reader3DS): File to read the vertices from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    numpy.ndarray: A (N, 3) float32 array of vertex coordinates.
+    """
+    return read_array(file, temp_chunk, '<f4', 3)
+
+
+def read_faces(file, temp_chunk):
+    """
+    Reads the face list of an OBJECT_FACES chunk, dropping the face flags.
+
+    Args:
+    file (Reader3DS): File to read the faces from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    numpy.ndarray: A (F, 3) uint16 array of vertex indices per face.
+    """
+    return read_array(file, temp_chunk, '<u2', 4)[:, :3]
+
+
+def read_uvs(file, temp_chunk):
+    """
+    Reads the payload of an OBJECT_UV chunk.
+
+    Args:
+    file (Reader3DS): File to read the UV coordinates from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    numpy.ndarray: A (N, 2) float32 array of per-vertex UV coordinates.
+    """
+    return read_array(file, temp_chunk, '<f4', 2)
+
+
+def read_face_indices(file, temp_chunk):
+    """
+    Reads the face list of an OBJECT_MATERIAL chunk.
+
+    Args:
+    file (Reader3DS): File to read the face indices from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    numpy.ndarray: A uint16 array of the faces using the material.
+    """
+    return read_array(file, temp_chunk, '<u2', 1).ravel()
+
+
+def read_byte_color(file, temp_chunk):
+    """
+    Reads a byte-based color from a file and converts it to a float-based color.
+
+    Args:
+    file (Reader3DS): File to read the color from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    list: A list of three floats representing the color.
+    """
+    layout = localspace_variable_names.STRUCT_3BYTE
+    temp_chunk.bytes_read += layout.size
+    return [float(col) / 255 for col in file.unpack(layout)]
+
+
+def read_int(file, temp_chunk):
+    """
+    Reads an integer from a file.
+
+    Args:
+    file (Reader3DS): File to read the integer from.
+    temp_chunk (Chunk3DS): The current chunk being processed.
+
+    Returns:
+    int: The integer read from the file.
+    """
+    layout = localspace_variable_names.STRUCT_UNSIGNED_INT
+    temp_chunk.bytes_read += layout.size
+    return file.unpack(layout)[0]
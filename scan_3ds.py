@@ -0,0 +1,97 @@
+from . import data_structure_3ds
+from . import localspace_variable_names
+from . import parse_3ds
+from . import reader_3ds
+
+from .chunk_3ds import Chunk3DS
+from .index_3ds import ObjectEntry3DS
+from .reader_3ds import Reader3DS
+
+
+class Summary3DS:
+    """
+    Summary3DS lists what a 3DS file contains, without any of its geometry.
+    """
+    __slots__ = ("version", "objects", "materials", "textures")
+
+    def __init__(self):
+        self.version = None
+        self.objects = []  # ObjectEntry3DS, without chunk positions or bounds
+        self.materials = []  # material names
+        self.textures = []  # texture file names, as stored in the file
+
+
+def scan_version(file, chunk, summary):
+    summary.version = reader_3ds.read_int(file, chunk)
+
+
+def scan_object(file, chunk, summary):
+    name = reader_3ds.read_string(file)[0]
+    summary.objects.append(ObjectEntry3DS(name, None))
+
+
+def scan_vertices(file, chunk, summary):
+    # Only the count, the walker skips the vertices by offset
+    summary.objects[-1].vertex_count = reader_3ds.read_short(file, chunk)
+
+
+def scan_faces(file, chunk, summary):
+    entry = summary.objects[-1]
+    entry.face_count = reader_3ds.read_short(file, chunk)
+    # the sub chunks follow the face list
+    file.skip(entry.face_count * localspace_variable_names.STRUCT_SIZE_4UNSIGNED_SHORT)
+
+
+def scan_face_material(file, chunk, summary):
+    summary.objects[-1].materials.append(reader_3ds.read_string(file)[0])
+
+
+def scan_material_name(file, chunk, summary):
+    summary.materials.append(reader_3ds.read_string(file)[0].rstrip())
+
+
+def scan_map_filepath(file, chunk, summary):
+    texture_name = reader_3ds.read_string(file)[0]
+    if texture_name not in summary.textures:
+        summary.textures.append(texture_name)
+
+
+def scan_lamp(file, chunk, summary):
+    # the sub chunks follow the lamp location
+    file.skip(localspace_variable_names.STRUCT_SIZE_3FLOAT)
+
+
+SCAN_HANDLERS = {
+    data_structure_3ds.VERSION: scan_version,
+    data_structure_3ds.OBJECT: scan_object,
+    data_structure_3ds.OBJECT_VERTICES: scan_vertices,
+    data_structure_3ds.OBJECT_FACES: scan_faces,
+    data_structure_3ds.OBJECT_MATERIAL: scan_face_material,
+    data_structure_3ds.OBJECT_LAMP: scan_lamp,
+    data_structure_3ds.MAT_NAME: scan_material_name,
+    data_structure_3ds.MAT_MAP_FILEPATH: scan_map_filepath,
+}
+
+
+def scan_3ds(filepath):
+    """
+    Lists the objects, materials and textures of a 3DS file without decoding
+    any vertex, face or UV data. Does not need Blender.
+
+    Args:
+    filepath (str): Path of the 3DS file.
+
+    Returns:
+    Summary3DS: The summary, or None if the file isn't a 3DS file.
+    """
+    with Reader3DS(filepath) as file:
+        chunk = Chunk3DS()
+        if len(file) < localspace_variable_names.STRUCT_CHUNK_HEADER.size:
+            return None
+        reader_3ds.read_chunk(file, chunk)
+        if chunk.ID != data_structure_3ds.PRIMARY:
+            return None
+
+        summary = Summary3DS()
+        parse_3ds.walk_chunks(file, chunk.ID, chunk.length, summary, SCAN_HANDLERS, {})
+        return summary
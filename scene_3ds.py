@@ -0,0 +1,130 @@
+import numpy as np
+
+
+def box_corners(box_min, box_max):
+    """
+    Returns the (8, 3) corners of an axis aligned box. Corner i takes the
+    max on the axes whose bit is set in i.
+    """
+    bits = (np.arange(8)[:, None] >> np.arange(3)) & 1
+    return np.where(bits, box_max, box_min)
+
+
+class TextureMap3DS:
+    """
+    TextureMap3DS holds the settings of one MAT_*_MAP block of a material.
+    """
+    __slots__ = ("mapto", "filename", "scale", "offset", "extension")
+
+    def __init__(self, mapto, filename, scale=(1.0, 1.0), offset=(0.0, 0.0), extension="wrap"):
+        self.mapto = mapto
+        self.filename = filename
+        self.scale = scale
+        self.offset = offset
+        self.extension = extension
+
+
+class Material3DS:
+    """
+    Material3DS holds the colors and texture maps of a MATERIAL block.
+    """
+    __slots__ = ("name", "ambient", "diffuse", "specular", "alpha", "maps")
+
+    def __init__(self, name="Material"):
+        self.name = name
+        self.ambient = None
+        self.diffuse = None
+        self.specular = None
+        self.alpha = None
+        self.maps = []
+
+    def signature(self):
+        """
+        Function to get the shape of the node graph this material needs:
+        the mapped channels with their extension modes and the alpha use.
+        Materials that only differ in colors, images and map scales share it.
+        """
+        maps = tuple((texture_map.mapto, texture_map.extension) for texture_map in self.maps)
+        use_alpha = self.alpha is not None and self.alpha < 1.0
+        return maps, use_alpha
+
+
+class Mesh3DS:
+    """
+    Mesh3DS holds the geometry of an OBJECT with an OBJECT_MESH block, as
+    arrays decoded straight from the file.
+    """
+    __slots__ = ("name", "vertices", "faces", "uvs", "materials", "matrix")
+
+    def __init__(self, name):
+        self.name = name
+        self.vertices = None  # float32 array: (verts, 3)
+        self.faces = None  # uint16 array: (faces, 3)
+        self.uvs = None  # float32 array: (verts, 2)
+        self.materials = []  # (matname, uint16 array of face_idxs)
+        self.matrix = None  # 12 floats, the rows of the 4x3 object matrix
+
+
+class Lamp3DS:
+    """
+    Lamp3DS holds an OBJECT with an OBJECT_LAMP block.
+    """
+    __slots__ = ("name", "location")
+
+    def __init__(self, name, location):
+        self.name = name
+        self.location = location
+
+
+class Node3DS:
+    """
+    Node3DS holds an object node of the EDITKEYFRAME section, which carries
+    the object hierarchy and pivots.
+    """
+    __slots__ = ("ID", "name", "instance_name", "parent", "pivot")
+
+    def __init__(self, node_id):
+        self.ID = node_id
+        self.name = None
+        self.instance_name = None
+        self.parent = None  # index of the parent node, 0xFFFF = no parent
+        self.pivot = None
+
+
+class Scene3DS:
+    """
+    Scene3DS is the Blender independent representation of a parsed 3DS file.
+    """
+    __slots__ = ("version", "materials", "meshes", "lamps", "nodes")
+
+    def __init__(self):
+        self.version = None
+        self.materials = []
+        self.meshes = []
+        self.lamps = []
+        self.nodes = []
+
+    def bounds(self, apply_matrix=True):
+        """
+        Function to get the bounds of all mesh vertices and lamps, as placed
+        by the importer. Vertices are stored in world space; when the object
+        matrices aren't applied to them, they are moved by them once more.
+
+        Returns:
+        numpy.ndarray: (2, 3) array of the min and max corners, or None if
+        the scene is empty.
+        """
+        corners = [np.array(lamp.location, dtype=np.float32).reshape(1, 3) for lamp in self.lamps]
+        for mesh in self.meshes:
+            if mesh.vertices is None or not len(mesh.vertices):
+                continue
+            box = np.array((mesh.vertices.min(axis=0), mesh.vertices.max(axis=0)))
+            if not apply_matrix and mesh.matrix:
+                matrix = np.array(mesh.matrix, dtype=np.float32).reshape(4, 3)
+                box = box_corners(box[0], box[1]) @ matrix[:3] + matrix[3]
+            corners.append(box)
+
+        if not corners:
+            return None
+        corners = np.concatenate(corners)
+        return np.array((corners.min(axis=0), corners.max(axis=0)))
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path):
+    """
+    Opens a uniquely named temporary file next to path for writing, and
+    moves it over path once the block completes. Readers never see a
+    partial file, and concurrent writers of the same path don't share a
+    temporary file.
+
+    Args:
+    path (str): Path of the file to write.
+
+    Yields:
+    file: The temporary file, opened in binary mode.
+    """
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory or None)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            yield file
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,93 @@
+"""
+Tests for the chunk writer of the exporter, which doesn't need Blender
+until save() is called.
+"""
+import io
+import struct
+import unittest
+
+import numpy as np
+
+from test_headless import import_package
+
+
+class ChunkWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        import_package()
+        from io_scene_3ds import export_3ds
+        self.export_3ds = export_3ds
+
+    def test_streamed_chunks_have_sizes(self):
+        e = self.export_3ds
+        version_chunk = e._3ds_chunk(e.VERSION)
+        version_chunk.add_variable("version", e._3ds_uint(3))
+        object_chunk = e._3ds_chunk(e.OBJECT)
+        object_chunk.add_variable("name", e._3ds_string(b"Obj"))
+
+        file = io.BytesIO()
+        stream = e._3ds_stream(file)
+        with stream.chunk(e.PRIMARY):
+            stream.add_subchunk(version_chunk)
+            with stream.chunk(e.OBJECTINFO):
+                stream.add_subchunk(object_chunk)
+
+        data = file.getvalue()
+        self.assertEqual(struct.unpack_from("<HI", data, 0), (e.PRIMARY, len(data)))
+        self.assertEqual(struct.unpack_from("<HII", data, 6), (e.VERSION, 10, 3))
+        self.assertEqual(struct.unpack_from("<HI", data, 16), (e.OBJECTINFO, len(data) - 16))
+        self.assertEqual(struct.unpack_from("<HI", data, 22), (e.OBJECT, 10))
+
+    def test_bulk_arrays_match_item_arrays(self):
+        e = self.export_3ds
+        faces = e._3ds_array()
+        for vertex_index in ((0, 1, 2), (2, 3, 0)):
+            faces.add(e._3ds_face(vertex_index))
+        bulk_faces = e._3ds_face_array([(0, 1, 2), (2, 3, 0)])
+
+        expected, written = io.BytesIO(), io.BytesIO()
+        faces.write(expected)
+        bulk_faces.write(written)
+        self.assertEqual(written.getvalue(), expected.getvalue())
+        self.assertEqual(bulk_faces.get_size(), faces.get_size())
+
+    def test_oversized_indices_are_invalid(self):
+        e = self.export_3ds
+        self.assertTrue(e._3ds_face_array([(0, 1, 65535)]).validate())
+        self.assertFalse(e._3ds_face_array([(0, 1, 65536)]).validate())
+        self.assertFalse(e._3ds_ushort_array(np.arange(65535, 65540)).validate())
+        self.assertFalse(e._3ds_ushort_array(np.arange(65536)).validate())
+
+        # the chunk of an object with wrapped indices is skipped by save()
+        face_chunk = e._3ds_chunk(e.OBJECT_FACES)
+        face_chunk.add_variable("faces", e._3ds_face_array([(0, 1, 70000)]))
+        self.assertFalse(face_chunk.validate())
+
+    def test_remove_face_uv(self):
+        coords = np.arange(12, dtype=np.float32).reshape(4, 3)
+        vertex_index = np.array(((0, 1, 2), (2, 3, 0), (0, 3, 1)))
+        # vertex 0 has two distinct uvs, one of them twice up to float noise, vertex 2 keeps
+        # one uv across both faces and vertex 3 gets two
+        faceuvs = np.array((
+            ((0.0, 0.0), (1.0, 0.0), (1.0, 1.0)),
+            ((1.0, 1.0), (0.0, 1.0), (0.0, 0.0000001)),
+            ((0.5, 0.5), (0.25, 1.0), (1.0, 0.0)),
+        ))
+
+        vert_array, uv_array, split_index = self.export_3ds.remove_face_uv(
+            coords, vertex_index, faceuvs)
+
+        # every corner keeps its position and its uv
+        np.testing.assert_array_equal(
+            vert_array.values[split_index.ravel()], coords[vertex_index.ravel()])
+        np.testing.assert_allclose(
+            uv_array.values[split_index.ravel()], faceuvs.reshape(-1, 2), atol=1e-6)
+
+        # one vertex per distinct (vertex, uv) pair
+        self.assertEqual(split_index.shape, (3, 3))
+        self.assertEqual(len(vert_array), 6)
+        self.assertEqual(len(uv_array), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Tests for the modules that must work without Blender. The package is loaded
+from the repository root under a fixed name, bpy is never imported.
+"""
+import importlib.util
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "io_scene_3ds"
+
+
+def import_package():
+    if PACKAGE not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE, os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE] = module
+        spec.loader.exec_module(module)
+    return sys.modules[PACKAGE]
+
+
+def chunk(chunk_id, payload=b"", children=()):
+    body = payload + b"".join(children)
+    return struct.pack("<HI", chunk_id, 6 + len(body)) + body
+
+
+def make_3ds():
+    """
+    Returns a file with a material, two textured meshes and a lamp.
+    """
+    objects = []
+    for i in range(2):
+        vertices = struct.pack("<H12f", 4, 0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, i)
+        faces = struct.pack("<H8H", 2, 0, 1, 2, 0, 0, 2, 3, 0)
+        face_material = chunk(0x4130, b"Mat\x00" + struct.pack("<3H", 2, 0, 1))
+        uvs = struct.pack("<H8f", 4, 0, 0, 1, 0, 1, 1, 0, 1)
+        matrix = struct.pack("<12f", 1, 0, 0, 0, 1, 0, 0, 0, 1, i, 0, 0)
+        mesh = chunk(0x4100, b"", [
+            chunk(0x4110, vertices), chunk(0x4120, faces, [face_material]),
+            chunk(0x4140, uvs), chunk(0x4160, matrix)])
+        objects.append(chunk(0x4000, b"Obj%d\x00" % i, [mesh]))
+
+    material = chunk(0xAFFF, b"", [
+        chunk(0xA000, b"Mat\x00"),
+        chunk(0xA020, b"", [chunk(0x0011, bytes((255, 0, 0)))]),
+        chunk(0xA200, b"", [chunk(0xA300, b"tex.png\x00")])])
+    lamp = chunk(0x4000, b"Lamp1\x00", [chunk(0x4600, struct.pack("<3f", 1, 2, 3))])
+    return chunk(0x4D4D, b"", [
+        chunk(0x0002, struct.pack("<I", 3)),
+        chunk(0x3D3D, b"", [material] + objects + [lamp])])
+
+
+class HeadlessTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.filepath = os.path.join(cls.directory.name, "scene.3ds")
+        with open(cls.filepath, "wb") as file:
+            file.write(make_3ds())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_package_imports_without_bpy(self):
+        package = import_package()
+        self.assertNotIn("bpy", sys.modules)
+        self.assertFalse(hasattr(package, "register"))
+
+    def test_scan_3ds(self):
+        import_package()
+        from io_scene_3ds import scan_3ds
+
+        summary = scan_3ds.scan_3ds(self.filepath)
+        self.assertEqual(summary.version, 3)
+        self.assertEqual([entry.name for entry in summary.objects], ["Obj0", "Obj1", "Lamp1"])
+        self.assertEqual([entry.vertex_count for entry in summary.objects], [4, 4, 0])
+        self.assertEqual(summary.objects[0].materials, ["Mat"])
+        self.assertEqual(summary.materials, ["Mat"])
+        self.assertEqual(summary.textures, ["tex.png"])
+
+    def test_parse_3ds(self):
+        import_package()
+        from io_scene_3ds import parse_3ds
+        from io_scene_3ds.reader_3ds import Reader3DS
+
+        with Reader3DS(self.filepath) as file:
+            scene = parse_3ds.parse_3ds(file)
+            self.assertEqual([mesh.name for mesh in scene.meshes], ["Obj0", "Obj1"])
+            self.assertEqual(scene.meshes[1].vertices.shape, (4, 3))
+            self.assertEqual(scene.meshes[1].faces.tolist(), [[0, 1, 2], [0, 2, 3]])
+            self.assertEqual(scene.meshes[0].uvs.shape, (4, 2))
+            self.assertEqual(scene.materials[0].maps[0].filename, "tex.png")
+            self.assertEqual(scene.lamps[0].location, (1.0, 2.0, 3.0))
+            self.assertEqual(scene.bounds().tolist(), [[0, 0, 0], [1, 2, 3]])
+
+    def test_chunk_index(self):
+        import_package()
+        from io_scene_3ds import index_3ds
+
+        index = index_3ds.get_chunk_index(self.filepath)
+        self.assertEqual([entry.name for entry in index.select_objects(["Obj*"])], ["Obj0", "Obj1"])
+        self.assertEqual(
+            [entry.name for entry in index.objects_in_sphere((0.0, 0.0, 1.0), 0.1)], ["Obj1"])
+        reloaded = index_3ds.get_chunk_index(self.filepath)
+        self.assertEqual(reloaded.parents.tolist(), index.parents.tolist())
+        # The size constraint of filtered imports uses the bounds of the whole file
+        self.assertEqual(reloaded.bounds().tolist(), [[0, 0, 0], [1, 2, 3]])
+
+    def test_damaged_sidecar_is_rebuilt(self):
+        import_package()
+        from io_scene_3ds import index_3ds
+
+        sidecar = self.filepath + index_3ds.SIDECAR_EXTENSION
+        index_3ds.get_chunk_index(self.filepath)
+        with open(sidecar, "rb") as file:
+            data = file.read()
+
+        for damaged in (b"", data[:len(data) // 2]):
+            with open(sidecar, "wb") as file:
+                file.write(damaged)
+            index = index_3ds.get_chunk_index(self.filepath)
+            self.assertEqual([entry.name for entry in index.objects], ["Obj0", "Obj1", "Lamp1"])
+            with open(sidecar, "rb") as file:
+                self.assertEqual(file.read(), data)
+
+    def test_parse_cache(self):
+        import_package()
+        from io_scene_3ds import cache_3ds
+        from io_scene_3ds.reader_3ds import Reader3DS
+
+        directory = os.path.join(self.directory.name, "cache")
+        with Reader3DS(self.filepath) as file:
+            scene = cache_3ds.parse_3ds_cached(file, self.filepath, directory=directory)
+        cached = cache_3ds.load_scene(self.filepath, directory)
+        self.assertEqual(cached.meshes[1].faces.tolist(), scene.meshes[1].faces.tolist())
+        self.assertEqual(os.listdir(directory), [cache_3ds.file_key(self.filepath) + ".3dscache"])
+
+        # A truncated entry is a miss
+        path = cache_3ds.cache_path(cache_3ds.file_key(self.filepath), directory)
+        with open(path, "r+b") as file:
+            file.truncate(os.path.getsize(path) - 16)
+        self.assertIsNone(cache_3ds.load_scene(self.filepath, directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
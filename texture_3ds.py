@@ -0,0 +1,282 @@
+import os
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Texture indexes by (root directory, recursive), reused across imports
+TEXTURE_INDEXES = {}
+# Held while an index is checked or built, so prefetch threads scan a directory once
+TEXTURE_INDEX_LOCK = threading.Lock()
+
+# Default budget of the session image cache, in bytes of texture files
+IMAGE_CACHE_BUDGET = 512 * 1024 * 1024
+
+# Threads used to prefetch the textures of an import
+PREFETCH_WORKERS = 8
+PREFETCH_BLOCK_SIZE = 1024 * 1024
+
+
+def dos_names(filename):
+    """
+    Returns the lower-case names a file can be referred to by in a 3DS file:
+    its own name, the name truncated to 8.3 and its DOS short name alias.
+
+    Args:
+    filename (str): Base name of the file.
+
+    Returns:
+    list: Lookup keys, most specific first.
+    """
+    name = filename.lower()
+    stem, ext = os.path.splitext(name)
+
+    names = [name]
+    short = stem[:8] + ext[:4]
+    if short != name:
+        names.append(short)
+
+    alias = stem.replace(" ", "").replace(".", "")
+    if len(stem) > 8 or len(ext) > 4 or alias != stem:
+        names.append(alias[:6] + "~1" + ext[:4])
+
+    return names
+
+
+class TextureIndex:
+    """
+    TextureIndex maps case-insensitive file names (including their 8.3 forms)
+    to paths for every file under a root directory, so textures are resolved
+    with one directory scan instead of one search per texture.
+    """
+    __slots__ = ("root", "recursive", "paths", "directories")
+
+    def __init__(self, root, recursive):
+        self.root = root
+        self.recursive = recursive
+        self.paths = {}
+        self.directories = {}  # directory: mtime, to detect changes
+
+        if recursive:
+            for dirpath, _dirnames, filenames in os.walk(root):
+                self.add_directory(dirpath, filenames)
+        elif os.path.isdir(root):
+            self.add_directory(root, [entry.name for entry in os.scandir(root) if entry.is_file()])
+
+    def add_directory(self, dirpath, filenames):
+        self.directories[dirpath] = os.stat(dirpath).st_mtime_ns
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            # os.walk is top-down, so files closer to the root take precedence
+            for name in dos_names(filename):
+                self.paths.setdefault(name, path)
+
+    def is_current(self):
+        """
+        Function to check that no file was added to or removed from the
+        scanned directories since the index was built.
+        """
+        try:
+            return all(
+                os.stat(dirpath).st_mtime_ns == mtime
+                for dirpath, mtime in self.directories.items()
+            )
+        except OSError:
+            return False
+
+    def find(self, texture_name):
+        """
+        Function to resolve a texture file name as stored in a 3DS file.
+
+        Returns:
+        str: Path of the texture, or None if it doesn't exist.
+        """
+        filename = os.path.basename(texture_name.replace("\\", "/"))
+        for name in dos_names(filename):
+            path = self.paths.get(name)
+            if path is not None:
+                return path
+        return None
+
+
+def get_texture_index(root, recursive):
+    """
+    Returns the texture index of a directory, scanning it only if it wasn't
+    indexed before or its contents changed.
+
+    Args:
+    root (str): Directory to search textures in.
+    recursive (bool): Whether subdirectories are searched too.
+
+    Returns:
+    TextureIndex: The index of the directory.
+    """
+    key = (os.path.abspath(root), recursive)
+    with TEXTURE_INDEX_LOCK:
+        index = TEXTURE_INDEXES.get(key)
+        if index is None or not index.is_current():
+            index = TEXTURE_INDEXES[key] = TextureIndex(key[0], recursive)
+    return index
+
+
+def find_texture(texture_name, dirname, get_index):
+    """
+    Resolves a texture file name as stored in a 3DS file to a path. The
+    directory index is only needed when the name isn't found next to the file.
+
+    Args:
+    texture_name (str): File name read from a MAT_MAP_FILEPATH chunk.
+    dirname (str): Directory of the 3DS file.
+    get_index (function): Returns the TextureIndex of the texture directory.
+
+    Returns:
+    str: Path of the texture, or None if it doesn't exist.
+    """
+    path = os.path.join(dirname, texture_name)
+    if os.path.isfile(path):
+        return path
+    return get_index().find(texture_name)
+
+
+class ImageCache:
+    """
+    ImageCache keeps the images loaded by previous imports of the session,
+    keyed on their absolute path and modification time, so textures shared by
+    many files are loaded once. Least recently used images are evicted when
+    the size of their files exceeds the budget.
+    """
+    __slots__ = ("budget", "size", "entries")
+
+    def __init__(self, budget=IMAGE_CACHE_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self.entries = OrderedDict()  # (path, mtime): (image, file size)
+
+    @staticmethod
+    def key(path):
+        return os.path.abspath(path), os.stat(path).st_mtime_ns
+
+    def get(self, path):
+        """
+        Function to get the cached image of a file, or None if it isn't cached,
+        was modified since or the image was deleted.
+        """
+        try:
+            key = self.key(path)
+        except OSError:
+            return None
+
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        image = entry[0]
+        try:
+            image.name
+        except ReferenceError:
+            self.discard(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return image
+
+    def add(self, path, image):
+        """
+        Function to cache the image loaded from a file.
+
+        Returns:
+        list: Images evicted to stay within the budget, for the caller to free.
+        """
+        key = self.key(path)
+        self.discard(key)
+        file_size = os.path.getsize(path)
+        self.entries[key] = (image, file_size)
+        self.size += file_size
+
+        evicted = []
+        while self.size > self.budget and len(self.entries) > 1:
+            old_key = next(iter(self.entries))
+            evicted.append(self.entries[old_key][0])
+            self.discard(old_key)
+        return evicted
+
+    def __contains__(self, path):
+        try:
+            return self.key(path) in self.entries
+        except OSError:
+            return False
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+# Image cache shared by all imports of the session
+IMAGE_CACHE = ImageCache()
+
+
+class TexturePrefetch:
+    """
+    TexturePrefetch resolves, checks and reads texture files on a thread pool
+    as soon as their names are parsed, so the file I/O overlaps with parsing
+    the geometry. Reading the files warms the OS cache for Blender, which
+    loads the images from the main thread once parsing is done.
+    """
+    __slots__ = ("dirname", "recursive", "executor", "index", "index_lock", "futures")
+
+    def __init__(self, dirname, recursive, max_workers=PREFETCH_WORKERS):
+        self.dirname = dirname
+        self.recursive = recursive
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="3ds_texture")
+        self.index = None  # resolved on the first texture missing next to the file
+        self.index_lock = threading.Lock()
+        self.futures = {}  # texture name: future of the texture path
+
+    def submit(self, texture_name):
+        """
+        Function to queue the prefetch of a texture, once per texture name.
+        """
+        future = self.futures.get(texture_name)
+        if future is None:
+            future = self.futures[texture_name] = self.executor.submit(
+                self.fetch, texture_name)
+        return future
+
+    def get_index(self):
+        """
+        Function to get the texture index of the import, looked up and
+        validated once.
+        """
+        if self.index is None:
+            with self.index_lock:
+                if self.index is None:
+                    self.index = get_texture_index(self.dirname, self.recursive)
+        return self.index
+
+    def fetch(self, texture_name):
+        path = find_texture(texture_name, self.dirname, self.get_index)
+        if path is not None and path not in IMAGE_CACHE:
+            try:
+                with open(path, "rb") as file:
+                    while file.read(PREFETCH_BLOCK_SIZE):
+                        pass
+            except OSError:
+                pass
+        return path
+
+    def result(self, texture_name):
+        """
+        Function to wait for the prefetch of a texture.
+
+        Returns:
+        str: Path of the texture, or None if it doesn't exist.
+        """
+        return self.submit(texture_name).result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)